@@ -0,0 +1,48 @@
+"""
+Throughput of the ImageHandler vector to matrix conversion for each pixel format.
+
+Run from the app directory:
+    python -m benchmarks.bench_image_handler --height 4096 --width 4096
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.common import measure, format_row
+from utils.image_handler import ImageHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--height", type=int, default=4096)
+    parser.add_argument("--width", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    height, width = args.height, args.width
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 4096, size=(height, width), dtype=np.uint16)
+
+    vectors = {
+        "Mono8": (pixels >> 4).astype(np.uint8).reshape(-1),
+        "Mono12": pixels.reshape(-1),
+        "Mono12Packed": ImageHandler.convert_image_grey_scale_matrix_to_vector(pixels, "Mono12Packed"),
+    }
+    out = np.empty(height * width, dtype=np.uint16)
+
+    cases = [(mode, vector, None) for mode, vector in vectors.items()]
+    cases.append(("Mono12Packed (out=)", vectors["Mono12Packed"], out))
+
+    print(f"Image {height}x{width}, {args.repeat} runs")
+    for name, vector, buffer in cases:
+        mode = name.split(" ")[0]
+        stats = measure(
+            lambda: ImageHandler.convert_image_grey_scale_vector_to_matrix(vector, height, width, mode, out=buffer),
+            repeat=args.repeat)
+        stats["mpix_per_s"] = height * width / (stats["p50_ms"] / 1000) / 1e6
+        stats["input_mb"] = vector.nbytes / 1e6
+        print(format_row(name, stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Latency and allocation benchmark of the utils image-processing kernels.
+
+Synthetic coil images (slanted edges, noise, missing edges) are generated at each
+size, every kernel is timed, and the results can be saved as a baseline JSON and
+compared against a previous run.
+
+Run from the app directory:
+    python -m benchmarks.bench_utils --sizes 8192x2048,4096x4096 --save baseline.json
+    python -m benchmarks.bench_utils --sizes 8192x2048,4096x4096 --compare baseline.json
+
+Sizes are HEIGHTxWIDTH, in pixels.
+"""
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.common import measure, measure_allocations, format_row
+from benchmarks.synthetic import generate_coil_image, generate_binary_coil_image
+from utils.crop_image import find_borders, find_borders_optimized, find_borders_in_bands, crop_and_measure
+from utils.width_measurement import calc_width_coil
+from utils.image_processing import apply_simple_thresholding, apply_morphological_closing, apply_morphological_opening
+from utils.image_cancatenator import ImageConcatenator
+
+DEFAULT_SIZES = "8192x2048,4096x4096"
+
+# Bands searched by crop_and_measure: (white pixel limit, start, end)
+CROP_BANDS = [(0.24, 0, 0.1), (0.08, 0, 1), (0.24, 0.9, 1), (0.24, 0.45, 0.55)]
+
+
+def build_kernels(height: int, width: int, seed: int) -> dict:
+    """
+    Build the benchmarked calls for one image size.
+
+    Returns:
+        dict: Kernel name -> function called without arguments.
+    """
+    gray = generate_coil_image(height, width, seed=seed)
+    binary = generate_binary_coil_image(height, width, seed=seed)
+    edges_buffer = np.empty_like(gray)
+
+    tile_height = 128
+    concatenator = ImageConcatenator(width=width, height=tile_height, concat_height=height)
+    tile = gray[:tile_height]
+
+    def fill():
+        concatenator.fill(tile)
+        image = concatenator.pop()
+        if image is not None:
+            concatenator.release(image)
+
+    return {
+        "find_borders": lambda: find_borders(binary, 0.08),
+        "find_borders_optimized": lambda: find_borders_optimized(binary, 0.08),
+        "find_borders_optimized x4 bands": lambda: [find_borders_optimized(binary, *band) for band in CROP_BANDS],
+        "find_borders_in_bands": lambda: find_borders_in_bands(binary, CROP_BANDS),
+        "crop_and_measure": lambda: crop_and_measure(gray, 0.45, 30),
+        "crop_and_measure (edges_buffer)": lambda: crop_and_measure(gray, 0.45, 30, edges_buffer=edges_buffer),
+        "calc_width_coil": lambda: calc_width_coil(binary, 20, 30),
+        "apply_simple_thresholding": lambda: apply_simple_thresholding(gray),
+        "apply_morphological_closing": lambda: apply_morphological_closing(binary, (5, 5), 2),
+        "apply_morphological_opening": lambda: apply_morphological_opening(binary, (5, 5), 2),
+        "ImageConcatenator.fill": fill,
+    }
+
+
+def run(sizes: list, repeat: int, seed: int, only: list = None) -> dict:
+    """
+    Run every kernel at every size.
+
+    Returns:
+        dict: "HEIGHTxWIDTH/kernel" -> latency and allocation stats.
+    """
+    results = {}
+    for height, width in sizes:
+        print(f"\nImage {height}x{width}, {repeat} runs")
+        for name, func in build_kernels(height, width, seed).items():
+            if only and not any(pattern in name for pattern in only):
+                continue
+            # The pure Python reference scan is orders of magnitude slower, keep its run count low
+            runs = max(3, repeat // 10) if name == "find_borders" else repeat
+            stats = measure(func, repeat=runs)
+            stats.update(measure_allocations(func))
+            results[f"{height}x{width}/{name}"] = stats
+            print(format_row(name, stats))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Print the p50 ratio of each kernel against the baseline.
+
+    Returns:
+        bool: True if no kernel got slower than the tolerance.
+    """
+    print(f"\nComparison with baseline from {baseline.get('created_at', '?')} (p50, tolerance {tolerance:.0%})")
+    ok = True
+    for key, stats in results.items():
+        reference = baseline["results"].get(key)
+        if reference is None:
+            print(f"{key:<60} new")
+            continue
+        ratio = stats["p50_ms"] / reference["p50_ms"]
+        regression = ratio > 1 + tolerance
+        ok = ok and not regression
+        flag = "REGRESSION" if regression else ""
+        print(f"{key:<60} {reference['p50_ms']:9.3f} -> {stats['p50_ms']:9.3f} ms  x{ratio:5.2f}  {flag}")
+    return ok
+
+
+def parse_sizes(text: str) -> list:
+    sizes = []
+    for size in text.split(","):
+        height, width = size.lower().split("x")
+        sizes.append((int(height), int(width)))
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma separated HEIGHTxWIDTH sizes.")
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", default=None, help="Comma separated substrings of the kernels to run.")
+    parser.add_argument("--save", default=None, help="Save the results as a baseline JSON.")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed p50 slowdown before flagging a regression.")
+    args = parser.parse_args()
+
+    only = args.only.split(",") if args.only else None
+    results = run(parse_sizes(args.sizes), args.repeat, args.seed, only)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "processor": platform.processor(),
+                "repeat": args.repeat,
+                "results": results,
+            }, file, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
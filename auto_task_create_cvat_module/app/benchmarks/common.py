@@ -0,0 +1,74 @@
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+import numpy as np
+
+
+def measure(func: Callable, repeat: int = 50, warmup: int = 3) -> Dict[str, float]:
+    """
+    Time a function over several runs.
+
+    Args:
+        func (Callable): Function called without arguments.
+        repeat (int): Number of timed runs.
+        warmup (int): Number of untimed runs before timing, to warm caches and lazy initialization.
+
+    Returns:
+        Dict[str, float]: Latency percentiles and mean, in milliseconds.
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = np.empty(repeat, dtype=np.float64)
+    for i in range(repeat):
+        start_time = time.perf_counter()
+        func()
+        samples[i] = time.perf_counter() - start_time
+
+    samples *= 1000
+    return {
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p90_ms": float(np.percentile(samples, 90)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "mean_ms": float(samples.mean()),
+        "min_ms": float(samples.min()),
+    }
+
+
+def measure_allocations(func: Callable) -> Dict[str, float]:
+    """
+    Measure the memory allocated by one call of a function.
+
+    NumPy buffers are reported to tracemalloc, so this covers the arrays created by
+    the kernels (including OpenCV outputs, which are allocated as NumPy arrays).
+
+    Args:
+        func (Callable): Function called without arguments.
+
+    Returns:
+        Dict[str, float]: Peak traced memory during the call and allocations still
+        alive after it, in megabytes.
+    """
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = func()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        "peak_alloc_mb": (peak - before) / 1e6,
+        "retained_mb": (after - before) / 1e6,
+    }
+
+
+def format_row(name: str, stats: Dict[str, float]) -> str:
+    """
+    Format the stats of a benchmark as a single report line.
+    """
+    values = "  ".join(f"{key}={value:9.3f}" for key, value in stats.items())
+    return f"{name:<40} {values}"
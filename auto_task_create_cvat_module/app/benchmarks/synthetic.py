@@ -0,0 +1,73 @@
+import numpy as np
+
+from utils.image_processing import apply_simple_thresholding
+
+
+def generate_coil_image(
+    height: int,
+    width: int,
+    coil_fraction: float = 0.6,
+    slant_px: int = 40,
+    noise_sigma: float = 4.0,
+    missing_edge_fraction: float = 0.05,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Generate a synthetic grayscale line-scan image of a coil over a dark background.
+
+    Args:
+        height (int): Image height, in rows.
+        width (int): Image width, in columns.
+        coil_fraction (float): Coil width as a fraction of the image width.
+        slant_px (int): Horizontal drift of the coil edges from the top to the bottom row.
+        noise_sigma (float): Standard deviation of the Gaussian sensor noise.
+        missing_edge_fraction (float): Fraction of rows where one of the edges fades
+            into the background, as happens with glare or an oily strip.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        np.ndarray: The uint8 grayscale image.
+    """
+    rng = np.random.default_rng(seed)
+
+    rows = np.arange(height)
+    center = width / 2 + slant_px * (rows / max(height - 1, 1) - 0.5)
+    # Slow wobble of the coil width, like a strip that is not perfectly flat
+    half_width = width * coil_fraction / 2 + 3 * np.sin(rows / 150)
+    left = np.clip(center - half_width, 0, width - 1).astype(np.int64)
+    right = np.clip(center + half_width, 0, width - 1).astype(np.int64)
+
+    columns = np.arange(width)
+    coil = (columns >= left[:, None]) & (columns <= right[:, None])
+    image = np.where(coil, 120.0, 6.0)
+
+    # Surface texture and a few bright scratches on the coil
+    image += rng.normal(0, noise_sigma, size=(height, width))
+    for _ in range(5):
+        row = rng.integers(0, height)
+        column = rng.integers(0, width)
+        image[row:row + 40, column:column + 3] += 80
+
+    # Rows where one edge fades and can not be found by the thresholding
+    missing = rng.random(height) < missing_edge_fraction
+    fade_width = max(width // 50, 1)
+    for row in np.flatnonzero(missing):
+        image[row, left[row]:left[row] + fade_width] = 6.0
+
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def generate_binary_coil_image(height: int, width: int, seed: int = 0, **kwargs) -> np.ndarray:
+    """
+    Generate a synthetic coil image thresholded to 0/255, as fed to the width measurement.
+
+    Args:
+        height (int): Image height, in rows.
+        width (int): Image width, in columns.
+        seed (int): Seed of the random generator.
+        **kwargs: Extra arguments of generate_coil_image.
+
+    Returns:
+        np.ndarray: The uint8 binary image.
+    """
+    return apply_simple_thresholding(generate_coil_image(height, width, seed=seed, **kwargs))
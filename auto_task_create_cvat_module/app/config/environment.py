@@ -14,10 +14,60 @@ class Environment:
         self.REDIS_HOST: str = os.getenv("REDIS_HOST")
         self.REDIS_DB: str = os.getenv("REDIS_DB")
         self.REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD")
+        # Aceita entradas em pickle nos streams (migração para frames binários); 0 rejeita
+        self.REDIS_ALLOW_PICKLE: bool = os.getenv("REDIS_ALLOW_PICKLE", "1") == "1"
 
         self.REDIS_STREAM_KEY_CONS: str = os.getenv("REDIS_STREAM_KEY_CONS")
         self.REDIS_STREAM_KEY_CONS2: str = os.getenv("REDIS_STREAM_KEY_CONS2")
 
+        # Gravação das imagens salvas: formato (png, webp ou jpeg) e parâmetros do codec
+        self.IMAGE_FORMAT: str = os.getenv("IMAGE_FORMAT", "png")
+        self.IMAGE_PNG_COMPRESSION: int = int(os.getenv("IMAGE_PNG_COMPRESSION", "1"))
+        self.IMAGE_JPEG_QUALITY: int = int(os.getenv("IMAGE_JPEG_QUALITY", "95"))
+        self.IMAGE_WRITER_WORKERS: int = int(os.getenv("IMAGE_WRITER_WORKERS", "2"))
+        self.IMAGE_WRITER_QUEUE_SIZE: int = int(os.getenv("IMAGE_WRITER_QUEUE_SIZE", "16"))
+
+        # Opções de envio das tasks ao CVAT (ver CVATClient); 0 em CVAT_CHUNK_SIZE ou CVAT_SEGMENT_SIZE deixa o CVAT decidir
+        self.CVAT_IMAGE_QUALITY: int = int(os.getenv("CVAT_IMAGE_QUALITY", "90"))
+        self.CVAT_USE_ZIP_CHUNKS: bool = os.getenv("CVAT_USE_ZIP_CHUNKS", "1") == "1"
+        self.CVAT_USE_CACHE: bool = os.getenv("CVAT_USE_CACHE", "1") == "1"
+        self.CVAT_CHUNK_SIZE: int = int(os.getenv("CVAT_CHUNK_SIZE", "4"))
+        self.CVAT_SORTING_METHOD: str = os.getenv("CVAT_SORTING_METHOD", "natural")
+        self.CVAT_SEGMENT_SIZE: int = int(os.getenv("CVAT_SEGMENT_SIZE", "0"))
+
+        # Backend de inferência: torch, onnx ou openvino (exportado uma vez ao lado do main.pt); volta para torch se falhar
+        self.INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "torch")
+        # Entrada fixa do modelo exportado, "(altura,largura)" ou "lado"; vazio usa o tamanho de treino
+        self.INFERENCE_EXPORT_IMGSZ: str = os.getenv("INFERENCE_EXPORT_IMGSZ", "")
+
+        # Resolução fixa de inferência por stream, "(altura,largura)" ou "lado"; vazio usa o padrão do modelo
+        self.INFERENCE_IMGSZ_CONS: str = os.getenv("INFERENCE_IMGSZ_CONS", "")
+        self.INFERENCE_IMGSZ_CONS2: str = os.getenv("INFERENCE_IMGSZ_CONS2", "")
+
+        # Inferência em tiles: tamanho "(altura,largura)" ou "lado"; vazio desativa
+        self.INFERENCE_TILE_SIZE: str = os.getenv("INFERENCE_TILE_SIZE", "")
+        self.INFERENCE_TILE_OVERLAP: int = int(os.getenv("INFERENCE_TILE_OVERLAP", "64"))
+        self.INFERENCE_TILE_IOU: float = float(os.getenv("INFERENCE_TILE_IOU", "0.5"))
+
+        # Cache de resultados da inferência: entradas em memória (0 desativa) e diretório opcional em disco
+        self.INFERENCE_CACHE_SIZE: int = int(os.getenv("INFERENCE_CACHE_SIZE", "0"))
+        self.INFERENCE_CACHE_DIR: str = os.getenv("INFERENCE_CACHE_DIR") or None
+
+        # Descarte de imagens quase idênticas às salvas recentemente (dHash + mesmos defeitos):
+        # off, shadow (só mede) ou on (descarta as duplicadas)
+        self.IMAGE_DEDUP_MODE: str = os.getenv("IMAGE_DEDUP_MODE", "off")
+        self.IMAGE_DEDUP_MAX_DISTANCE: int = int(os.getenv("IMAGE_DEDUP_MAX_DISTANCE", "1"))
+        self.IMAGE_DEDUP_CAPACITY: int = int(os.getenv("IMAGE_DEDUP_CAPACITY", "256"))
+        # Lado da grade, em pixels, em que os centros dos defeitos são comparados
+        self.IMAGE_DEDUP_CELL_SIZE: float = float(os.getenv("IMAGE_DEDUP_CELL_SIZE", "32"))
+
+        # Filtro antes da inferência: off, shadow (só mede) ou on (descarta frames sem candidatos)
+        self.FRAME_GATE_MODE: str = os.getenv("FRAME_GATE_MODE", "off")
+        self.FRAME_GATE_MIN_VARIANCE: float = float(os.getenv("FRAME_GATE_MIN_VARIANCE", "25"))
+        self.FRAME_GATE_MIN_EDGE_DENSITY: float = float(os.getenv("FRAME_GATE_MIN_EDGE_DENSITY", "0.02"))
+        self.FRAME_GATE_ANOMALY_THRESHOLD: int = int(os.getenv("FRAME_GATE_ANOMALY_THRESHOLD", "25"))
+        self.FRAME_GATE_MIN_ANOMALY_FRACTION: float = float(os.getenv("FRAME_GATE_MIN_ANOMALY_FRACTION", "0.0001"))
+
         
         
 
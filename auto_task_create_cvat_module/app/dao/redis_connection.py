@@ -1,20 +1,35 @@
 import redis
 import atexit
+import logging
 import pickle
+import queue
+import threading
 from prometheus_client import Summary, Counter
 from functools import wraps
+from utils.frame_codec import encode_frame, decode_frame, is_binary_frame
 
 class RedisConnection:
     _instance_counter = 0
     
-    def __init__(self, host, port, db, password = None):
+    def __init__(self, host, port, db, password = None, allow_pickle = True):
         """
         Initializes the connection to the Redis server.
         
         Inicializa a conexão com o servidor Redis.
+
+        Args:
+            allow_pickle (bool): Accepts entries in the pickle format. Unpickling runs arbitrary
+                code from whoever can write to the stream, so turn it off once every producer
+                sends binary frames. Default is True, during the migration.
+
+        Args:
+            allow_pickle (bool): Aceita entradas no formato pickle. O unpickle executa código
+                arbitrário de quem pode escrever no stream, então desative quando todos os
+                produtores enviarem frames binários. O padrão é True, durante a migração.
         """
         RedisConnection._instance_counter += 1
         self.__instance_id = RedisConnection._instance_counter
+        self.allow_pickle = allow_pickle
         self.__host = host
         self.__port = port
         self.__db = db
@@ -45,6 +60,7 @@ class RedisConnection:
         self.STREAM_READ_TIME = Summary(f'redis_queue_read_time_seconds_{self.__instance_id}', 'Time spent reading from the queue')
         self.PUSH_COUNTER = Counter(f'redis_queue_write_total_{self.__instance_id}', 'Total number of Redis write operations performed')
         self.READ_COUNTER = Counter(f'redis_queue_read_total_{self.__instance_id}', 'Total number of Redis read operations performed')
+        self.REJECTED_COUNTER = Counter(f'redis_queue_rejected_total_{self.__instance_id}', 'Total number of stream entries skipped because they could not be deserialized')
 
         self._decorate_methods()
 
@@ -56,6 +72,7 @@ class RedisConnection:
         """
         self.add_to_stream = self._time_decorator(self.add_to_stream, self.STREAM_WRITE_TIME)
         self.get_from_stream = self._time_decorator(self.get_from_stream, self.STREAM_READ_TIME)
+        self.get_from_streams = self._time_decorator(self.get_from_streams, self.STREAM_READ_TIME)
 
     def _time_decorator(self, func, metric):
         @wraps(func)
@@ -81,7 +98,7 @@ class RedisConnection:
         print("Connection terminated")
         self.redis_client.close()
 
-    def add_to_stream(self, data: dict, stream_key: str, max_len: int = 50):
+    def add_to_stream(self, data: dict, stream_key: str, max_len: int = 50, wire_format: str = "pickle"):
         """
         Adds data to a stream in Redis.
         
@@ -91,6 +108,8 @@ class RedisConnection:
             stream_key (str): Name of the stream where the data will be added.
             data (dict): Data to be added as a dictionary, should be serialized with the pickle library.
             max_len (int, optional): Maximum length of the stream. Default is 50.
+            wire_format (str, optional): "pickle" or "binary". The binary format sends a fixed header
+                with the camera metadata and the raw pixel buffer, see utils/frame_codec.py. Default is "pickle".
 
         Returns:
             str: The ID of the added entry.
@@ -99,14 +118,22 @@ class RedisConnection:
             stream_key (str): Nome do stream onde os dados serão adicionados.
             data (dict): Dados a serem adicionados como um dicionário, deve ser serializado com a biblioteca pickle.
             max_len (int, optional): Comprimento máximo do stream. O padrão é 50.
+            wire_format (str, optional): "pickle" ou "binary". O formato binário envia um cabeçalho fixo
+                com os metadados da câmera e o buffer de pixels bruto, ver utils/frame_codec.py. O padrão é "pickle".
 
         Returns:
             str: O ID da entrada adicionada.
         """
-        serialized_data = pickle.dumps(data)
+        if wire_format == "binary":
+            fields = encode_frame(data)
+        elif wire_format == "pickle":
+            fields = {"data_serialized": pickle.dumps(data)}
+        else:
+            raise ValueError(f"Unknown wire format '{wire_format}'. Use 'pickle' or 'binary'.")
+
         entry_id = self.redis_client.xadd(
             stream_key,
-            {"data_serialized": serialized_data},
+            fields,
             maxlen=max_len,
             approximate=True
         )
@@ -149,13 +176,9 @@ class RedisConnection:
             # Obtém o ID da mensagem atual
             currentID = message[0]
 
-            # Extracts the serialized data from the message
-            # Extrai os dados serializados da mensagem
-            data_serialized = message[1][b'data_serialized']
-
-            # Deserializes the data using the pickle library
-            # Desserializa os dados usando a biblioteca pickle
-            deserialized_data = pickle.loads(data_serialized)
+            # Deserializes the data, detecting the wire format of the message
+            # Desserializa os dados, detectando o formato da mensagem
+            deserialized_data = self._deserialize_fields(message[1])
 
             # Updates the last read ID
             # Atualiza o último ID lido
@@ -170,6 +193,145 @@ class RedisConnection:
         # Retorna None se não houver mensagens
         return None
 
+    def get_from_streams(self, last_ids: dict, count: int = 1, block: int = 0) -> list:
+        """
+        Reads from several streams in Redis with a single XREAD and returns every entry that is ready.
+
+        Lê de vários streams no Redis com um único XREAD e retorna todas as entradas disponíveis.
+
+        Args:
+            last_ids (dict): Mapping of stream name to the ID of the last entry read from it.
+                The mapping is updated in place with the new last IDs.
+            count (int): Maximum number of entries read from each stream. Default is 1.
+            block (int): Milliseconds to block waiting for data. 0 blocks until any stream has data.
+
+        Returns:
+            list: A list of (stream_key, deserialized_data, last_id) tuples, empty if the read timed out.
+                Entries that can not be deserialized (or pickle entries when it is not allowed) are
+                logged, counted and skipped, and the last IDs still move past them.
+
+        Args:
+            last_ids (dict): Mapeamento do nome do stream para o ID da última entrada lida.
+                O mapeamento é atualizado com os novos IDs.
+            count (int): Número máximo de entradas lidas de cada stream. O padrão é 1.
+            block (int): Milissegundos de espera por dados. 0 espera até qualquer stream ter dados.
+
+        Returns:
+            list: Uma lista de tuplas (stream_key, dados_desserializados, last_id), vazia se a leitura expirar.
+                Entradas que não podem ser desserializadas (ou em pickle quando não é permitido) são
+                registradas, contadas e ignoradas, e os últimos IDs avançam além delas.
+        """
+        # Reads up to `count` messages per stream in a single round trip, so a quiet stream does not hold back the others
+        # Lê até `count` mensagens por stream em uma única ida ao servidor, assim um stream parado não segura os outros
+        stream_messages = self.redis_client.xread(last_ids, count=count, block=block)
+
+        entries = []
+        for stream_name, message_list in stream_messages or []:
+            stream_key = stream_name.decode() if isinstance(stream_name, bytes) else stream_name
+            for current_id, fields in message_list:
+                # Updates the last read ID of this stream, also past an entry that is skipped below
+                # Atualiza o último ID lido deste stream, também além de uma entrada ignorada abaixo
+                last_ids[stream_key] = current_id
+                self.READ_COUNTER.inc()
+
+                # A bad entry is skipped on its own, so it neither drops the rest of the batch nor is read again
+                # Uma entrada inválida é ignorada sozinha, sem perder o resto do lote nem ser lida de novo
+                try:
+                    deserialized_data = self._deserialize_fields(fields)
+                except Exception as e:
+                    self.REJECTED_COUNTER.inc()
+                    logging.warning(f"Skipped stream entry {stream_key}/{current_id!r}: {e}")
+                    continue
+
+                entries.append((stream_key, deserialized_data, current_id))
+
+        return entries
+
+    def iter_stream(self, last_ids: dict, count: int = 8, block: int = 1000):
+        """
+        Yields entries from the streams while the next batch is prefetched on a background thread.
+
+        Retorna as entradas dos streams enquanto o próximo lote é lido em uma thread de segundo plano.
+
+        Args:
+            last_ids (dict): Mapping of stream name to the ID of the last entry read from it.
+                The mapping is owned by the generator and updated as batches are prefetched.
+            count (int): Maximum number of entries read from each stream per batch. Default is 8.
+            block (int): Milliseconds each read blocks waiting for data. Default is 1000.
+
+        Yields:
+            tuple: (stream_key, deserialized_data, last_id) for each entry, in batch order.
+
+        Args:
+            last_ids (dict): Mapeamento do nome do stream para o ID da última entrada lida.
+                O mapeamento pertence ao gerador e é atualizado conforme os lotes são lidos.
+            count (int): Número máximo de entradas lidas de cada stream por lote. O padrão é 8.
+            block (int): Milissegundos de espera por dados em cada leitura. O padrão é 1000.
+
+        Yields:
+            tuple: (stream_key, dados_desserializados, last_id) para cada entrada, na ordem do lote.
+        """
+        # A single slot: one batch is processed while the next one is in flight
+        # Uma única posição: um lote é processado enquanto o próximo está sendo lido
+        batches = queue.Queue(maxsize=1)
+        stop_event = threading.Event()
+
+        def prefetch():
+            try:
+                while not stop_event.is_set():
+                    entries = self.get_from_streams(last_ids=last_ids, count=count, block=block)
+                    if not entries:
+                        continue
+                    while not stop_event.is_set():
+                        try:
+                            batches.put(entries, timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+            except Exception as e:
+                # Forwards the error to the consumer instead of dying silently
+                # Repassa o erro para o consumidor em vez de morrer silenciosamente
+                batches.put(e)
+
+        prefetch_thread = threading.Thread(
+            target=prefetch, name=f"redis-prefetch-{self.__instance_id}", daemon=True)
+        prefetch_thread.start()
+
+        try:
+            while True:
+                entries = batches.get()
+                if isinstance(entries, Exception):
+                    raise entries
+                yield from entries
+        finally:
+            stop_event.set()
+
+    def _deserialize_fields(self, fields: dict) -> dict:
+        """
+        Deserializes the fields of a stream message, accepting the binary format and, if allowed, the pickle format.
+
+        Desserializa os campos de uma mensagem do stream, aceitando o formato binário e, se permitido, o formato pickle.
+
+        Args:
+            fields (dict): Fields of the stream message.
+            fields (dict): Campos da mensagem do stream.
+
+        Returns:
+            dict: Deserialized data.
+            dict: Dados desserializados.
+
+        Raises:
+            ValueError: If the message is not a binary frame and pickle is not allowed.
+            ValueError: Se a mensagem não for um frame binário e o pickle não for permitido.
+        """
+        # Binary frames keep the pixels in the Redis reply buffer (no copy)
+        # Frames binários mantêm os pixels no buffer da resposta do Redis (sem cópia)
+        if is_binary_frame(fields):
+            return decode_frame(fields)
+        if not self.allow_pickle:
+            raise ValueError("Rejected a stream entry that is not a binary frame: pickle payloads are not allowed.")
+        return pickle.loads(fields[b'data_serialized'])
+
     def get_stream_length(self, stream_name):
         """
         Returns the length of the stream.
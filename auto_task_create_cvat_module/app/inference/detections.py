@@ -0,0 +1,79 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+# One row per detection, in original image pixels
+DETECTION_DTYPE = np.dtype([
+    ("class_id", np.int32),
+    ("cx", np.float32),
+    ("cy", np.float32),
+    ("w", np.float32),
+    ("h", np.float32),
+    ("conf", np.float32),
+])
+
+
+class Detections(Mapping):
+    """
+    Detections of one frame, stored as a compact structured array.
+
+    Behaves as the {"defects": [...]} dict returned by ModelManagerYolo, but the list of
+    defect dicts is only built the first time the "defects" key is read. Callers that
+    only need counts or coordinates use the array directly.
+
+    Attributes:
+        array (np.ndarray): Structured array of DETECTION_DTYPE.
+    """
+
+    def __init__(self, array: np.ndarray, names: dict, colors: list) -> None:
+        """
+        Args:
+            array (np.ndarray): Structured array of DETECTION_DTYPE.
+            names (dict): Class index -> class name of the model.
+            colors (list): Hex colors, picked by class index.
+        """
+        self.array = array
+        self._names = names
+        self._colors = colors
+        self._defects = None
+
+    def __getitem__(self, key):
+        if key != "defects":
+            raise KeyError(key)
+        if self._defects is None:
+            self._defects = [
+                {
+                    "Name": self._names[class_id],
+                    "bounding_box_x_px": cx,
+                    "bounding_box_y_px": cy,
+                    "bounding_box_width_px": w,
+                    "bounding_box_height_px": h,
+                    "color_hex": self._colors[class_id % len(self._colors)],
+                }
+                # tolist converte cada linha em tipos Python de uma só vez
+                for class_id, cx, cy, w, h, _ in self.array.tolist()
+            ]
+        return self._defects
+
+    def __iter__(self):
+        return iter(("defects",))
+
+    def __len__(self) -> int:
+        return 1
+
+    def __repr__(self) -> str:
+        return f"Detections({len(self.array)} defects)"
+
+    def to_records(self) -> list:
+        """
+        Returns the rows as JSON serializable lists, in DETECTION_DTYPE field order.
+        """
+        return self.array.tolist()
+
+    @classmethod
+    def from_records(cls, records: list, names: dict, colors: list) -> "Detections":
+        """
+        Rebuilds the detections from the rows returned by to_records.
+        """
+        array = np.array([tuple(record) for record in records], dtype=DETECTION_DTYPE)
+        return cls(array, names, colors)
@@ -1,13 +1,87 @@
+import os
 import cv2
 import math
 import base64
+import shutil
+import hashlib
+import logging
+import numpy as np
 import torch
 from ultralytics import YOLO
 
+from inference.detections import DETECTION_DTYPE, Detections
+from utils.image_processing import convert_to_8bit
+
+# Padding value used by the ultralytics letterbox
+LETTERBOX_PAD_VALUE = 114
+
+# Inference backends: name of the exported artifact, saved next to the .pt weights ("torch" runs the .pt itself)
+INFERENCE_BACKENDS = {
+    "torch": None,
+    "onnx": "{stem}_{height}x{width}.onnx",
+    "openvino": "{stem}_{height}x{width}_openvino_model",
+}
+
 class ModelManagerYolo:
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, tile_size=None, tile_overlap=64, tile_iou_threshold=0.5, cache=None,
+                 backend="torch", export_imgsz=None):
+        """
+        Args:
+            model_path (str): Path of the YOLO weights.
+            tile_size (int | tuple, optional): Tile (height, width) of the tiled inference
+                mode. When set, frames are cut into overlapping tiles at native resolution
+                instead of being shrunk to the model input size.
+            tile_overlap (int): Overlap between neighbouring tiles, in pixels. Defects smaller
+                than the overlap always appear whole in at least one tile.
+            tile_iou_threshold (float): Overlap above which two detections of the same class
+                from different tiles are merged.
+            cache (InferenceCache, optional): Cache of results. Frames already scored with the
+                same weights and parameters are answered from it without running the model.
+            backend (str): Inference backend, one of 'torch', 'onnx' or 'openvino'. The exported
+                backends run the model on CPU through ONNX Runtime or OpenVINO; the export is
+                done once and reused. Falls back to 'torch' if the export or the runtime fails.
+            export_imgsz (int | tuple, optional): Fixed (height, width) input of the exported
+                model. Uses the training size of the weights when omitted.
+
+        Raises:
+            ValueError: If the backend is unknown.
+        """
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}'. Use one of: {', '.join(INFERENCE_BACKENDS)}.")
+
         self.model_path = model_path
         self.model = YOLO(self.model_path)
+        self.backend = "torch"
+        # Modelos exportados têm entrada de tamanho fixo: o letterbox completa até este tamanho (auto=False)
+        self.fixed_imgsz = None
+
+        if backend != "torch":
+            if export_imgsz is None:
+                export_imgsz = self.model.overrides.get("imgsz", 640)
+            if isinstance(export_imgsz, int):
+                export_imgsz = (export_imgsz, export_imgsz)
+            elif len(export_imgsz) == 1:
+                export_imgsz = (export_imgsz[0], export_imgsz[0])
+            try:
+                self.model = self._load_exported(backend, tuple(export_imgsz))
+                self.backend = backend
+                self.fixed_imgsz = tuple(export_imgsz)
+            except Exception as e:
+                logging.exception(f"Failed to load the {backend} backend, falling back to torch: {e}")
+
+        if isinstance(tile_size, int):
+            tile_size = (tile_size, tile_size)
+        elif tile_size is not None and len(tile_size) == 1:
+            tile_size = (tile_size[0], tile_size[0])
+        if tile_size is not None and tile_overlap >= min(tile_size):
+            raise ValueError(f"The tile overlap ({tile_overlap}) must be smaller than the tile size {tile_size}.")
+        self.tile_size = tuple(tile_size) if tile_size is not None else None
+        self.tile_overlap = tile_overlap
+        self.tile_iou_threshold = tile_iou_threshold
+
+        self.cache = cache
+        # Os resultados em cache valem só para estes pesos, mesmo que o arquivo seja trocado no mesmo caminho
+        self._weights_digest = self._file_digest(model_path) if cache is not None else None
         
         # Definindo uma lista de cores para as classes, cada cor será associada ao índice da classe correspondente
         self.colors = [
@@ -16,14 +90,48 @@ class ModelManagerYolo:
             "#33FF70", "#3370FF", "#FF33DA", "#DAFF33", "#70DAFF", "#DAFF70", "#FF3377", "#7733FF", "#33FF77", "#FF7733"
         ]
 
+        # Letterbox geometry per (input shape, imgsz) and input buffers per (device, geometry), reused across calls
+        self._letterbox_cache = {}
+        self._input_buffers = {}
+
+    def _load_exported(self, backend, imgsz):
+        """
+        Loads the model exported for a backend, exporting it first if needed.
+
+        The artifact is cached next to the .pt weights and exported again only when the
+        weights are newer. A warmup prediction checks that the runtime actually works.
+
+        Args:
+            backend (str): 'onnx' or 'openvino'.
+            imgsz (tuple): Fixed (height, width) input of the exported model.
+
+        Returns:
+            YOLO: The exported model.
+        """
+        stem, _ = os.path.splitext(self.model_path)
+        exported_path = INFERENCE_BACKENDS[backend].format(stem=stem, height=imgsz[0], width=imgsz[1])
+
+        if not os.path.exists(exported_path) or os.path.getmtime(exported_path) < os.path.getmtime(self.model_path):
+            logging.info(f"Exporting {self.model_path} to {backend} ({imgsz[0]}x{imgsz[1]})")
+            # dynamic=True mantém o tamanho do lote variável; a altura e a largura seguem fixas no letterbox
+            produced_path = str(self.model.export(format=backend, imgsz=imgsz, dynamic=True))
+            if os.path.isdir(exported_path):
+                shutil.rmtree(exported_path)
+            os.replace(produced_path, exported_path)
+
+        model = YOLO(exported_path, task="detect")
+        model(np.zeros((imgsz[0], imgsz[1], 3), dtype=np.uint8), imgsz=imgsz, verbose=False)
+        logging.info(f"Inference backend: {backend} ({exported_path})")
+        return model
+
     def getAllClassesNameAndIndexToModel(self):
-        return self.model.model.names
+        return self.model.names
 
     def gpuIsAvaliable(self):
         return torch.cuda.is_available()
 
     def detect_defects_and_return_data(self, img, confidence_threshold=0.1):
-        results = self.model(img, stream=True, imgsz=640)
+        results = self.model(img, stream=True, imgsz=self.fixed_imgsz or 640)
         defects = []
 
         # Obtém a altura e a largura da imagem original
@@ -38,8 +146,8 @@ class ModelManagerYolo:
                 cls = int(box.cls[0])
 
                 # Verifica se a classe existe no modelo
-                if cls in self.model.model.names:
-                    defect_name = self.model.model.names[cls]
+                if cls in self.model.names:
+                    defect_name = self.model.names[cls]
                     color_hex = self.colors[cls % len(self.colors)]  # Associa cor fixa com base no índice
 
                     if conf > confidence_threshold:
@@ -68,56 +176,429 @@ class ModelManagerYolo:
         return data
 
     def detect_defects_using_xywhn(self, img, confidence_threshold=0.1, width = None, height = None):
-        if width or height is None:
-            results = self.model(img, stream=True)
+        if width is None or height is None:
+            imgsz = None
         else:
-            results = self.model(img, stream=True, imgsz=(height, width))
+            imgsz = (height, width)
 
             
              #imgsz=640)
-        defects = []
         # Obtém a altura e a largura da imagem original
         image_height, image_width = img.shape[:2]
         print ("##############################################################")
         print (img.shape[:2])
 
-        for r in results:
-            boxes = r.boxes
-            for box in boxes:
-                # Obter as coordenadas normalizadas no formato xywhn
-                x_center_n, y_center_n, width_n, height_n = box.xywhn[0]  # Coordenadas normalizadas
-        
-                # Desnormalizar para o tamanho real da imagem
+        def compute(images):
+            if self.tile_size is not None:
+                return self._detect_defects_tiled(images, confidence_threshold)
 
-                width = width_n * image_width
-                height = height_n * image_height
-                x_center = ((x_center_n * image_width))
-                y_center = ((y_center_n * image_height))
+            results, geometry = self._predict(images, imgsz, fixed_shape=imgsz is not None)
+            return [self._extract_detections(r, image_height, image_width, confidence_threshold, geometry) for r in results]
 
+        return self._cached([img], confidence_threshold, imgsz, compute)[0]
 
-                # Confiança e classe do defeito
-                conf = math.ceil((box.conf[0] * 100)) / 100
-                cls = int(box.cls[0])
+    def detect_defects_batch(self, images, confidence_threshold=0.1, width=None, height=None):
+        """
+        Runs a single forward pass over several frames and returns the defects of each one.
 
-                # Verifica se a classe existe no modelo
-                if cls in self.model.model.names:
-                    defect_name = self.model.model.names[cls]
-                    color_hex = self.colors[cls % len(self.colors)]  # Associa cor fixa com base no índice
+        Args:
+            images (list | np.ndarray): List of frames or a stacked array of shape (N, H, W[, C]).
+                Grayscale frames can be passed directly, without converting them to BGR.
+            confidence_threshold (float): Minimum confidence for a detection to be kept.
+            width (int, optional): Inference width. Uses the model default when omitted.
+            height (int, optional): Inference height. Uses the model default when omitted.
+                When both are given every frame is letterboxed to exactly this size (rounded
+                up to the model stride), so the compute per frame does not depend on its shape.
+                This holds for grayscale, Mono12 and BGR frames alike.
+                Both are ignored in the tiled mode, where tiles run at native resolution.
 
-                    # Verifica se a confiança é maior que o limiar configurado
-                    if conf > confidence_threshold:
-                        defects.append({
-                            "Name": defect_name,
-                            "bounding_box_x_px": float(x_center),
-                            "bounding_box_y_px": float(y_center),
-                            "bounding_box_width_px": float(width),
-                            "bounding_box_height_px": float(height),
-                            "color_hex": color_hex,
-                        })
+        Returns:
+            list: One Detections per input frame. Each one reads as the {"defects": [...]} dict
+            returned by detect_defects_using_xywhn and keeps the compact array in .array.
+        """
+        # Um array empilhado vira uma lista de views, sem copiar os frames
+        images = list(images)
+        if not images:
+            return []
 
-        # Criar o dicionário no formato especificado
-        data = {
-            "defects": defects,
+        imgsz = None if width is None or height is None else (height, width)
+
+        def compute(images):
+            if self.tile_size is not None:
+                return self._detect_defects_tiled(images, confidence_threshold)
+
+            results, geometry = self._predict(images, imgsz, fixed_shape=imgsz is not None)
+            return [
+                self._extract_detections(r, *img.shape[:2], confidence_threshold, geometry)
+                for img, r in zip(images, results)
+            ]
+
+        return self._cached(images, confidence_threshold, imgsz, compute)
+
+    def _cached(self, images, confidence_threshold, imgsz, compute):
+        """
+        Answers the frames already in the cache and runs compute, in one batch, on the others.
+
+        Args:
+            images (list): The frames.
+            confidence_threshold (float): Confidence threshold of the call, part of the cache key.
+            imgsz (tuple): Inference size of the call, part of the cache key.
+            compute (Callable): Runs the model over a list of frames and returns one Detections per frame.
+
+        Returns:
+            list: One Detections per frame, in input order.
+        """
+        if self.cache is None:
+            return compute(images)
+
+        identity = (
+            f"{self._weights_digest}|backend={self.backend}|conf={confidence_threshold}|imgsz={self.fixed_imgsz or imgsz}"
+            f"|tile={self.tile_size},{self.tile_overlap},{self.tile_iou_threshold}"
+        )
+        keys = [self.cache.key(img, identity) for img in images]
+        batch_data = []
+        for key in keys:
+            records = self.cache.get(key)
+            batch_data.append(None if records is None else Detections.from_records(records, self.model.names, self.colors))
+
+        missing = [i for i, data in enumerate(batch_data) if data is None]
+        if missing:
+            for i, data in zip(missing, compute([images[i] for i in missing])):
+                self.cache.put(keys[i], data.to_records())
+                batch_data[i] = data
+
+        return batch_data
+
+    @staticmethod
+    def _file_digest(path, chunk_size=1 << 20):
+        """
+        Returns the BLAKE2b hex digest of a file.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _detect_defects_tiled(self, images, confidence_threshold):
+        """
+        Runs the tiles of every frame as a single batch and merges the detections of each frame.
+
+        Returns:
+            list: One Detections per input frame.
+        """
+        tiles, origins, owners = [], [], []
+        for index, img in enumerate(images):
+            tile_height = min(self.tile_size[0], img.shape[0])
+            tile_width = min(self.tile_size[1], img.shape[1])
+            for y in self._tile_origins(img.shape[0], tile_height):
+                for x in self._tile_origins(img.shape[1], tile_width):
+                    # Views of the frame, the tiles are only copied into the input buffer
+                    tiles.append(img[y:y + tile_height, x:x + tile_width])
+                    origins.append((x, y))
+                    owners.append(index)
+
+        # Frames of different shapes give tiles of different shapes, each shape runs as one batch
+        boxes = [None] * len(tiles)
+        for shape in dict.fromkeys(tile.shape[:2] for tile in tiles):
+            indices = [i for i, tile in enumerate(tiles) if tile.shape[:2] == shape]
+            results, geometry = self._predict([tiles[i] for i in indices], imgsz=shape)
+            for i, r in zip(indices, results):
+                boxes[i] = self._tile_boxes(r, origins[i], geometry)
+
+        batch_data = []
+        for index in range(len(images)):
+            # Each box carries the index of its tile, only boxes of different tiles are merged
+            frame_boxes = [
+                (*b, np.full(len(b[1]), tile, dtype=np.int64))
+                for tile, (b, owner) in enumerate(zip(boxes, owners)) if owner == index
+            ]
+            xyxy, conf, cls, tile = (np.concatenate(parts) for parts in zip(*frame_boxes))
+            keep = conf > confidence_threshold
+            xyxy, conf, cls = self._merge_tile_boxes(xyxy[keep], conf[keep], cls[keep], tile[keep])
+            batch_data.append(self._detections_from_xyxy(xyxy, conf, cls))
+
+        return batch_data
+
+    def _tile_origins(self, length, tile_length):
+        """
+        Returns the start of each tile along one axis. The last tile is aligned to the end of
+        the frame, so every tile has the same size.
+        """
+        step = tile_length - self.tile_overlap
+        if length <= tile_length:
+            return [0]
+        origins = list(range(0, length - tile_length, step))
+        origins.append(length - tile_length)
+        return origins
+
+    def _tile_boxes(self, result, origin, geometry=None):
+        """
+        Pulls the boxes of a tile result to NumPy, in full frame pixels.
+
+        Returns:
+            tuple: The (N, 4) xyxy boxes, the confidences and the class indices.
+        """
+        boxes = result.boxes
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.float64)
+        if geometry is not None:
+            # Remove o padding e a escala do letterbox
+            xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - geometry["left"]) / geometry["scale"]
+            xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - geometry["top"]) / geometry["scale"]
+        xyxy[:, [0, 2]] += origin[0]
+        xyxy[:, [1, 3]] += origin[1]
+
+        # Mesmo arredondamento da confiança usado em _extract_detections
+        conf = np.ceil(boxes.conf.cpu().numpy() * 100) / 100
+        cls = boxes.cls.cpu().numpy().astype(np.int64)
+        return xyxy, conf, cls
+
+    def _merge_tile_boxes(self, xyxy, conf, cls, tile):
+        """
+        Class-wise greedy NMS over the detections of all the tiles of a frame.
+
+        A defect cut by a tile seam shows up whole in one tile and partially in the other,
+        so the overlap is measured over the smaller box: the partial box lies inside the
+        whole one and is suppressed even when their IoU is low.
+
+        Only boxes of different tiles are compared. Boxes of the same tile already went
+        through the model NMS, and a small defect inside a larger one of the same class
+        must survive. Every box lies inside its tile, so two boxes of different tiles can
+        only overlap in the band shared by the tiles.
+
+        Returns:
+            tuple: The kept boxes, confidences and class indices, by decreasing confidence.
+        """
+        order = np.argsort(-conf, kind="stable")
+        xyxy, conf, cls, tile = xyxy[order], conf[order], cls[order], tile[order]
+        areas = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+
+        suppressed = np.zeros(len(conf), dtype=bool)
+        for i in range(len(conf)):
+            if suppressed[i]:
+                continue
+            candidates = np.flatnonzero(
+                ~suppressed[i + 1:] & (cls[i + 1:] == cls[i]) & (tile[i + 1:] != tile[i])) + i + 1
+            if candidates.size == 0:
+                continue
+            inter_width = np.minimum(xyxy[i, 2], xyxy[candidates, 2]) - np.maximum(xyxy[i, 0], xyxy[candidates, 0])
+            inter_height = np.minimum(xyxy[i, 3], xyxy[candidates, 3]) - np.maximum(xyxy[i, 1], xyxy[candidates, 1])
+            intersection = np.clip(inter_width, 0, None) * np.clip(inter_height, 0, None)
+            smaller = np.maximum(np.minimum(areas[i], areas[candidates]), 1e-9)
+            suppressed[candidates[intersection / smaller > self.tile_iou_threshold]] = True
+
+        keep = ~suppressed
+        return xyxy[keep], conf[keep], cls[keep]
+
+    def _detections_from_xyxy(self, xyxy, conf, cls):
+        """
+        Converts full frame xyxy boxes into Detections, dropping classes unknown to the model.
+        """
+        keep = np.isin(cls, list(self.model.names))
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+
+        detections = np.empty(len(cls), dtype=DETECTION_DTYPE)
+        detections["class_id"] = cls
+        detections["cx"] = (xyxy[:, 0] + xyxy[:, 2]) / 2
+        detections["cy"] = (xyxy[:, 1] + xyxy[:, 3]) / 2
+        detections["w"] = xyxy[:, 2] - xyxy[:, 0]
+        detections["h"] = xyxy[:, 3] - xyxy[:, 1]
+        detections["conf"] = conf
+        return Detections(detections, self.model.names, self.colors)
+
+    def _predict(self, images, imgsz=None, fixed_shape=False):
+        """
+        Runs the model over a list of images.
+
+        Images of the same shape, grayscale or BGR, are letterboxed into reused buffers and
+        fed to the model as a tensor, skipping the GRAY2BGR copy and the ultralytics
+        preprocessing, so the input shape is the one computed by _letterbox_geometry.
+        Mono12 frames (12-bit values in uint16) are scaled to 8 bits first. Only a batch
+        mixing shapes, or another dtype or channel count, goes through the regular
+        ultralytics path.
+
+        Args:
+            images (list): The images to run.
+            imgsz (tuple, optional): Inference (height, width). Uses the model default when omitted.
+            fixed_shape (bool): Pads every image up to imgsz (auto=False) instead of the next stride multiple.
+
+        Returns:
+            tuple: The results generator and the letterbox geometry used, or None if
+            ultralytics did the preprocessing itself.
+        """
+        # Mono12 chega em uint16 com valores de 12 bits; o modelo espera a escala de 8 bits
+        images = [convert_to_8bit(img) if img.dtype == np.uint16 else img for img in images]
+        if all(
+            img.dtype == np.uint8 and img.shape == images[0].shape and (img.ndim == 2 or img.shape[2] == 3)
+            for img in images
+        ):
+            tensor, geometry = self._prepare_tensor(images, imgsz, fixed_shape)
+            return self.model(tensor, stream=True), geometry
+
+        # Lotes com formatos misturados seguem pelo pré-processamento do ultralytics
+        images = [cv2.cvtColor(img, cv2.COLOR_GRAY2BGR) if img.ndim == 2 else img for img in images]
+        imgsz = self.fixed_imgsz or imgsz
+        if imgsz is None:
+            return self.model(images, stream=True), None
+        return self.model(images, stream=True, imgsz=imgsz), None
+
+    def _letterbox_geometry(self, image_height, image_width, imgsz=None, fixed_shape=False):
+        """
+        Computes the letterbox scale and padding for an input shape, once per shape.
+
+        Follows the ultralytics LetterBox: the image is scaled to fit imgsz and, by default
+        (auto=True), padded only up to the next multiple of the model stride. With
+        fixed_shape (auto=False) it is padded up to imgsz itself. In both cases imgsz is first
+        rounded up to the stride, as check_imgsz does, so the padded shape is a multiple of it.
+        Exported backends have a fixed input, so the image is always padded up to
+        fixed_imgsz whatever imgsz was asked.
+
+        Returns:
+            dict: The scale, the resized size, the padding offsets and the padded shape.
+        """
+        if self.fixed_imgsz is not None:
+            imgsz = self.fixed_imgsz
+        elif imgsz is None:
+            imgsz = self.model.overrides.get("imgsz", 640)
+        if isinstance(imgsz, int):
+            imgsz = (imgsz, imgsz)
+        imgsz = tuple(imgsz)
+
+        key = (image_height, image_width, imgsz, fixed_shape)
+        geometry = self._letterbox_cache.get(key)
+        if geometry is not None:
+            return geometry
+
+        fixed_shape = fixed_shape or self.fixed_imgsz is not None
+        stride = int(self.model.model.stride.max()) if self.fixed_imgsz is None else 1
+        # Como o check_imgsz do ultralytics: o tamanho é arredondado para cima até o stride. Sem isso
+        # um tile de 600x600 ou mais estreito que o tamanho pedido gera um tensor fora do stride
+        imgsz = (math.ceil(imgsz[0] / stride) * stride, math.ceil(imgsz[1] / stride) * stride)
+
+        scale = min(imgsz[0] / image_height, imgsz[1] / image_width)
+        resized_width = int(round(image_width * scale))
+        resized_height = int(round(image_height * scale))
+
+        if fixed_shape:
+            padded_height, padded_width = imgsz
+        else:
+            padded_height = resized_height + (imgsz[0] - resized_height) % stride
+            padded_width = resized_width + (imgsz[1] - resized_width) % stride
+        pad_width = (padded_width - resized_width) / 2
+        pad_height = (padded_height - resized_height) / 2
+        top, bottom = int(round(pad_height - 0.1)), int(round(pad_height + 0.1))
+        left, right = int(round(pad_width - 0.1)), int(round(pad_width + 0.1))
+
+        geometry = {
+            "scale": scale,
+            "resized_height": resized_height,
+            "resized_width": resized_width,
+            "top": top,
+            "left": left,
+            "height": resized_height + top + bottom,
+            "width": resized_width + left + right,
         }
+        self._letterbox_cache[key] = geometry
+        return geometry
 
-        return data
+    def _prepare_tensor(self, images, imgsz=None, fixed_shape=False):
+        """
+        Letterboxes uint8 grayscale or BGR images into a reused (N, 3, H, W) RGB float tensor on the model device.
+
+        Returns:
+            tuple: The input tensor and its letterbox geometry.
+        """
+        image_height, image_width = images[0].shape[:2]
+        channels = images[0].shape[2:]
+        geometry = self._letterbox_geometry(image_height, image_width, imgsz, fixed_shape)
+
+        device = self._input_device()
+        key = (device, len(images), geometry["height"], geometry["width"], *channels)
+        buffers = self._input_buffers.get(key)
+        if buffers is None:
+            # O padding é preenchido uma única vez; cada chamada só reescreve a área da imagem
+            canvas = np.full((len(images), geometry["height"], geometry["width"], *channels), LETTERBOX_PAD_VALUE, dtype=np.uint8)
+            tensor = torch.empty((len(images), 3, geometry["height"], geometry["width"]), dtype=torch.float32, device=device)
+            buffers = (canvas, torch.from_numpy(canvas), tensor)
+            self._input_buffers[key] = buffers
+        canvas, canvas_tensor, tensor = buffers
+
+        top, left = geometry["top"], geometry["left"]
+        resized_height, resized_width = geometry["resized_height"], geometry["resized_width"]
+        for i, img in enumerate(images):
+            region = canvas[i, top:top + resized_height, left:left + resized_width]
+            if (resized_height, resized_width) == img.shape[:2]:
+                region[...] = img
+            else:
+                cv2.resize(img, (resized_width, resized_height), dst=region, interpolation=cv2.INTER_LINEAR)
+
+        # Converte para float no dispositivo e normaliza, sem alocar
+        if not channels:
+            # Replica o canal cinza nos 3 canais
+            tensor[:, 0].copy_(canvas_tensor)
+            tensor[:, 0].div_(255)
+            tensor[:, 1].copy_(tensor[:, 0])
+            tensor[:, 2].copy_(tensor[:, 0])
+        else:
+            # BGR -> RGB, como o pré-processamento do ultralytics
+            for channel in range(3):
+                tensor[:, channel].copy_(canvas_tensor[..., 2 - channel])
+            tensor.div_(255)
+
+        return tensor, geometry
+
+    def _input_device(self):
+        """
+        Returns the device the model runs on, where the input tensors are allocated.
+
+        The ultralytics predictor only picks the device, and moves the model there, on the
+        first prediction. Until then the tensor is built on the CPU and ultralytics copies it.
+        """
+        predictor = getattr(self.model, "predictor", None)
+        if predictor is None or getattr(predictor, "device", None) is None:
+            return torch.device("cpu")
+        return torch.device(predictor.device)
+
+    def _extract_detections(self, result, image_height, image_width, confidence_threshold, geometry=None):
+        """
+        Converts the boxes of a single ultralytics result into Detections.
+
+        The boxes are pulled to NumPy once, filtered with a mask and mapped back to the
+        original image in a single vectorized step.
+
+        Args:
+            result: An ultralytics Results object.
+            image_height (int): Height of the original image.
+            image_width (int): Width of the original image.
+            confidence_threshold (float): Minimum confidence for a detection to be kept.
+            geometry (dict, optional): Letterbox geometry of a tensor input. The boxes are
+                then in letterboxed pixels and are mapped back to the original image.
+
+        Returns:
+            Detections: The defects found in the result.
+        """
+        boxes = result.boxes
+        # Confiança arredondada para cima em duas casas, como antes
+        conf = np.ceil(boxes.conf.cpu().numpy() * 100) / 100
+        cls = boxes.cls.cpu().numpy().astype(np.int32)
+        keep = (conf > confidence_threshold) & np.isin(cls, list(self.model.names))
+
+        if geometry is None:
+            # Desnormaliza as coordenadas xywhn para o tamanho real da imagem
+            xywh = boxes.xywhn.cpu().numpy()[keep] * np.array(
+                [image_width, image_height, image_width, image_height], dtype=np.float32)
+        else:
+            # Remove o padding e a escala do letterbox
+            xywh = boxes.xywh.cpu().numpy()[keep]
+            xywh[:, 0] -= geometry["left"]
+            xywh[:, 1] -= geometry["top"]
+            xywh /= np.float32(geometry["scale"])
+
+        detections = np.empty(int(keep.sum()), dtype=DETECTION_DTYPE)
+        detections["class_id"] = cls[keep]
+        detections["cx"] = xywh[:, 0]
+        detections["cy"] = xywh[:, 1]
+        detections["w"] = xywh[:, 2]
+        detections["h"] = xywh[:, 3]
+        detections["conf"] = conf[keep]
+        return Detections(detections, self.model.names, self.colors)
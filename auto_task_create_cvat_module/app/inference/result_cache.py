@@ -0,0 +1,140 @@
+import os
+import copy
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.metrics_prometheus import register_inference_cache_lookup
+
+
+class InferenceCache:
+    """
+    Content-addressed LRU cache of inference results.
+
+    Results are keyed by a BLAKE2b hash of the frame pixels and of an identity string
+    describing everything else the result depends on (model weights, thresholds, input
+    size). The most recent entries are kept in memory; with a directory, every entry is
+    also written there as JSON so it survives restarts and memory evictions.
+
+    Attributes:
+        max_entries (int): Maximum number of entries kept in memory.
+        directory (str): Directory of the on-disk tier, or None for a memory only cache.
+        hits (int): Lookups answered from memory or disk.
+        misses (int): Lookups that had to run inference.
+    """
+
+    def __init__(self, max_entries: int = 1024, directory: str = None) -> None:
+        """
+        Initializes an empty cache.
+
+        Args:
+            max_entries (int): Maximum number of entries kept in memory.
+            directory (str, optional): Directory of the on-disk tier. Created if it does not exist.
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(image: np.ndarray, identity: str) -> str:
+        """
+        Computes the cache key of a frame.
+
+        Args:
+            image (np.ndarray): The frame.
+            identity (str): Model and parameters identity the result depends on.
+
+        Returns:
+            str: The hexadecimal key.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{identity}|{image.shape}|{image.dtype.str}".encode())
+        # Hashes the pixel buffer in place, without a tobytes copy
+        digest.update(memoryview(np.ascontiguousarray(image)).cast("B"))
+        return digest.hexdigest()
+
+    @property
+    def hit_ratio(self) -> float:
+        """
+        Fraction of the lookups answered without running inference.
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, key: str):
+        """
+        Returns a copy of the cached result of a key, or None if it is not cached.
+        """
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                register_inference_cache_lookup("memory")
+                return copy.deepcopy(result)
+
+        result = self._read(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                register_inference_cache_lookup("miss")
+                return None
+            self.hits += 1
+            register_inference_cache_lookup("disk")
+            self._store(key, result)
+        return copy.deepcopy(result)
+
+    def put(self, key: str, result) -> None:
+        """
+        Caches a JSON serializable result.
+        """
+        result = copy.deepcopy(result)
+        with self._lock:
+            self._store(key, result)
+        self._write(key, result)
+
+    def _store(self, key: str, result) -> None:
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        # Subdiretórios pelo prefixo da chave evitam um diretório com milhares de arquivos
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read(self, key: str):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, json.JSONDecodeError) as e:
+            logging.warning(f"Ignoring unreadable inference cache entry {key}: {e}")
+            return None
+
+    def _write(self, key: str, result) -> None:
+        if self.directory is None:
+            return
+        path = self._path(key)
+        temporary_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                json.dump(result, file)
+            # A entrada aparece inteira ou não aparece, mesmo se o processo morrer no meio da escrita
+            os.replace(temporary_path, path)
+        except OSError as e:
+            logging.warning(f"Failed to write inference cache entry {key}: {e}")
@@ -1,17 +1,24 @@
 import os
 import time
 import traceback
-import cv2
+import threading
 import numpy as np
 from datetime import datetime
 from config.logger import get_logger
 from dao.redis_connection import RedisConnection
 from utils.image_handler import ImageHandler
 from inference.model_manager import ModelManagerYolo
+from inference.result_cache import InferenceCache
 from config.environment import Environment
 from prometheus_client import start_http_server
-from utils.metrics_prometheus import register_execution_time_gauge
+from utils.metrics_prometheus import register_execution_time_gauge, register_frame_gate_decision, register_frame_gate_miss, register_image_dedup
 from utils.cvat_requests import CVATClient  # Assumindo que você tenha um cliente CVAT configurado
+from utils.pipeline import Pipeline, Stage
+from utils.image_writer import ImageWriter
+from utils.spool_manager import SpoolManager
+from utils.helper import parse_tuple
+from utils.frame_gate import FrameGate
+from utils.image_dedup import ImageDeduplicator
 
 start_http_server(8123)
 
@@ -36,6 +43,16 @@ password = "qwer1234Q."
 project_id = 18
 min_defects_to_save_image = 1
 conf_model = 0.1
+STREAM_BATCH_SIZE = 8  # Número máximo de frames lidos de cada stream por XREAD
+
+# Pipeline: número de workers de cada estágio e capacidade das filas entre eles
+PIPELINE_QUEUE_SIZE = 8
+DECODE_WORKERS = 2
+GATE_WORKERS = 1
+INFERENCE_WORKERS = 1  # O modelo é compartilhado, manter 1 worker
+INFERENCE_BATCH_SIZE = 4  # Frames já enfileirados são inferidos juntos, até este limite
+PERSISTENCE_WORKERS = 1  # A codificação e a escrita rodam no pool do ImageWriter
+UPLOAD_WORKERS = 1  # O controle de tasks por dia assume um único uploader
 
 ####################### UTILITIES #######################
 
@@ -43,43 +60,43 @@ def create_directory_if_not_exists(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
-def clear_directory(directory):
-    for filename in os.listdir(directory):
-        file_path = os.path.join(directory, filename)
-        try:
-            if os.path.isfile(file_path) or os.path.islink(file_path):
-                os.unlink(file_path)
-        except Exception as e:
-            logger.error(f'Failed to delete {file_path}. Reason: {e}')
-
-def save_image(image_matrix, image_count, path):
+def save_image(image_writer, image_matrix, image_count, path):
+    """Enfileira a imagem no pool de gravação e retorna o Future com o caminho salvo."""
     timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
-    image_name = f"{timestamp}_{image_count}.png"
+    image_name = f"{timestamp}_{image_count}.{image_writer.extension}"
     image_path = os.path.join(path, image_name)
-    cv2.imwrite(image_path, image_matrix)
-    logger.info(f"Image saved: {image_path}")
-    return image_path
-
-def get_image_count_in_directory(directory):
-    return len([name for name in os.listdir(directory) if os.path.isfile(os.path.join(directory, name))])
+    return image_writer.submit(image_matrix, image_path)
 
-def get_path_imagens(diretorio_raiz):
-    imagens = []
-    for root, dirs, files in os.walk(diretorio_raiz):
-        for file in files:
-            if file.endswith(('.jpg', '.png')):
-                imagens.append(os.path.join(root, file))
-    return imagens
+def parse_imgsz(value):
+    """Converte "(altura,largura)" ou "lado" em (altura, largura); vazio ou inválido retorna None."""
+    imgsz = parse_tuple(value, default=None)
+    if imgsz is not None and len(imgsz) == 1:
+        imgsz = (imgsz[0], imgsz[0])
+    return imgsz
 
 ####################### MAIN #######################
 
 def main():
     MODEL_PATH1 = "/home/igor/projects/CVAT/auto_task_create_cvat_module/app/inference/models/main.pt"
     MODEL_PATH2 = "/code/app/inference/models/main.pt"
+    backend = {
+        "backend": env.INFERENCE_BACKEND,
+        "export_imgsz": parse_tuple(env.INFERENCE_EXPORT_IMGSZ, default=None),
+    }
+    # Frames altos são inferidos em tiles na resolução nativa quando INFERENCE_TILE_SIZE é definido
+    tiling = {
+        "tile_size": parse_tuple(env.INFERENCE_TILE_SIZE, default=None),
+        "tile_overlap": env.INFERENCE_TILE_OVERLAP,
+        "tile_iou_threshold": env.INFERENCE_TILE_IOU,
+    }
+    # Reprocessar um trecho do stream ou o spool não roda o modelo de novo sobre frames já avaliados
+    cache = None
+    if env.INFERENCE_CACHE_SIZE > 0:
+        cache = InferenceCache(max_entries=env.INFERENCE_CACHE_SIZE, directory=env.INFERENCE_CACHE_DIR)
     try:
-        model_manager = ModelManagerYolo(model_path=MODEL_PATH2)
+        model_manager = ModelManagerYolo(model_path=MODEL_PATH2, cache=cache, **backend, **tiling)
     except:
-        model_manager = ModelManagerYolo(model_path=MODEL_PATH1)
+        model_manager = ModelManagerYolo(model_path=MODEL_PATH1, cache=cache, **backend, **tiling)
 
     print(f"A GPU está ativada? \n {model_manager.gpuIsAvaliable()}")
     time.sleep(2)
@@ -89,84 +106,195 @@ def main():
     redis_con = RedisConnection(
         host=env.REDIS_HOST,
         port=env.REDIS_PORT,
-        db=env.REDIS_DB
+        db=env.REDIS_DB,
+        allow_pickle=env.REDIS_ALLOW_PICKLE
     )
 
-    client = CVATClient(cvat_url=cvat_url, username=username, password=password)
+    client = CVATClient(
+        cvat_url=cvat_url,
+        username=username,
+        password=password,
+        image_quality=env.CVAT_IMAGE_QUALITY,
+        use_zip_chunks=env.CVAT_USE_ZIP_CHUNKS,
+        use_cache=env.CVAT_USE_CACHE,
+        chunk_size=env.CVAT_CHUNK_SIZE or None,
+        sorting_method=env.CVAT_SORTING_METHOD,
+        segment_size=env.CVAT_SEGMENT_SIZE or None)
+
+    # Resolução fixa de cada stream: custo de inferência previsível por frame, qualquer que seja a altura costurada
+    stream_imgsz = {
+        env.REDIS_STREAM_KEY_CONS: parse_imgsz(env.INFERENCE_IMGSZ_CONS),
+        env.REDIS_STREAM_KEY_CONS2: parse_imgsz(env.INFERENCE_IMGSZ_CONS2),
+    }
 
-    image_count = 0
-    current_id_stream_1 = "0"
-    current_id_stream_2 = "0"
-    image_paths = []
+    last_ids = {
+        env.REDIS_STREAM_KEY_CONS: "0",
+        env.REDIS_STREAM_KEY_CONS2: "0",
+    }
 
     create_directory_if_not_exists(IMAGE_SAVE_DIR)
-    toggle = True
+    # Índice em memória das imagens salvas; o diretório só é varrido aqui, na inicialização
+    spool = SpoolManager(directory=IMAGE_SAVE_DIR)
 
-    tasks_created_today = 0  # Contador de tasks criadas hoje
-    current_day = datetime.now().day  # Inicializa com o dia atual
+    image_writer = ImageWriter(
+        image_format=env.IMAGE_FORMAT,
+        png_compression=env.IMAGE_PNG_COMPRESSION,
+        jpeg_quality=env.IMAGE_JPEG_QUALITY,
+        workers=env.IMAGE_WRITER_WORKERS,
+        queue_size=env.IMAGE_WRITER_QUEUE_SIZE)
 
-    while True:
+    gate = FrameGate(
+        mode=env.FRAME_GATE_MODE,
+        min_variance=env.FRAME_GATE_MIN_VARIANCE,
+        min_edge_density=env.FRAME_GATE_MIN_EDGE_DENSITY,
+        anomaly_threshold=env.FRAME_GATE_ANOMALY_THRESHOLD,
+        min_anomaly_fraction=env.FRAME_GATE_MIN_ANOMALY_FRACTION)
+
+    deduplicator = ImageDeduplicator(
+        mode=env.IMAGE_DEDUP_MODE,
+        max_distance=env.IMAGE_DEDUP_MAX_DISTANCE,
+        capacity=env.IMAGE_DEDUP_CAPACITY,
+        cell_size=env.IMAGE_DEDUP_CELL_SIZE)
+
+    # Estado compartilhado entre os workers de persistência e o uploader
+    state = {
+        "image_count": 0,
+        "tasks_created_today": 0,  # Contador de tasks criadas hoje
+    }
+    state_lock = threading.Lock()
+
+    ################### DECODE ###################
+    def decode_frame(entry):
+        stream_key, metadata, _ = entry
         start_time = time.perf_counter()
 
-        ################### GET DATA FROM CAM SERVICE ################### 
-        
-        if toggle:
-            # Processa o primeiro stream
-            metadata, current_id_stream_1 = redis_con.get_from_stream(
-                stream_key=env.REDIS_STREAM_KEY_CONS, 
-                last_id=current_id_stream_1)
-        else:
-            # Processa o segundo stream
-            metadata, current_id_stream_2 = redis_con.get_from_stream(
-                stream_key=env.REDIS_STREAM_KEY_CONS2, 
-                last_id=current_id_stream_2)
-        
-        toggle = not toggle
-        
-        ################### PROCESS IMAGE ################### 
         matrix_image = ImageHandler.convert_image_grey_scale_vector_to_matrix(
             image_vector=metadata["camera"]["image"],
             height=metadata["camera"]["height"],
             width=metadata["camera"]["width"],
             mode=metadata["camera"]["pixelformat"])
-        
-        complete_matrix_image_bgr = cv2.cvtColor(matrix_image, cv2.COLOR_GRAY2BGR)
 
-        image_height, image_width = complete_matrix_image_bgr.shape[:2]
-        defects = model_manager.detect_defects_using_xywhn(img=complete_matrix_image_bgr,confidence_threshold=conf_model)
+        return {
+            "stream_key": stream_key,
+            "metadata": metadata,
+            "image": matrix_image,
+            "start_time": start_time,
+        }
+
+    ################### GATE ###################
+    def gate_frame(frame):
+        has_candidates, _ = gate.evaluate(frame["image"])
+        register_frame_gate_decision("pass" if has_candidates else "skip")
+
+        # Frames sem candidatos não passam pelo modelo; no modo shadow só são marcados
+        if not has_candidates and gate.mode == "on":
+            return None
+        frame["gate_passed"] = has_candidates
+        return frame
+
+    ################### INFERENCE ###################
+    def infer_frames(frames):
+        # Frames de streams com a mesma resolução são inferidos juntos
+        groups = {}
+        for frame in frames:
+            groups.setdefault(stream_imgsz.get(frame["stream_key"]), []).append(frame)
 
-        
-        metadata["defects"] = defects["defects"]
+        for imgsz, group in groups.items():
+            height, width = imgsz if imgsz is not None else (None, None)
+            # O modelo recebe a imagem em tons de cinza direto, sem a cópia GRAY2BGR
+            results = model_manager.detect_defects_batch(
+                images=[frame["image"] for frame in group],
+                confidence_threshold=conf_model,
+                width=width,
+                height=height)
+
+            # A lista de dicts dos defeitos só é montada por quem lê detections["defects"]
+            for frame, detections in zip(group, results):
+                frame["detections"] = detections
+                # Defeitos num frame que o gate descartaria: o gate está agressivo demais
+                if frame.get("gate_passed") is False and len(detections.array):
+                    register_frame_gate_miss()
+        return frames
+
+    ################### SAVE IMAGE ###################
+    def persist_frame(frame):
+        register_execution_time_gauge(time.perf_counter() - frame["start_time"])
+
+        if len(frame["detections"].array) < min_defects_to_save_image:
+            return None
+
+        # Linha parada ou lenta gera frames quase idênticos; só o primeiro vai para o CVAT
+        if deduplicator.mode != "off":
+            if deduplicator.is_duplicate(frame["image"], frame["detections"].array):
+                register_image_dedup("duplicate")
+                if deduplicator.mode == "on":
+                    return None
+            else:
+                register_image_dedup("kept")
+
+        with state_lock:
+            state["image_count"] += 1
+            image_count = state["image_count"]
+
+        # A gravação roda no pool do ImageWriter; o uploader espera o Future antes de registrar a imagem no spool
+        frame["image_saved"] = save_image(
+            image_writer=image_writer, image_matrix=frame["image"], image_count=image_count, path=IMAGE_SAVE_DIR)
+        return frame
+
+    ################### UPLOAD TO CVAT ###################
+    def upload_images(frame):
+        # Uma imagem que não pôde ser gravada é descartada sozinha, sem parar o pipeline
+        try:
+            frame["image_path"] = frame["image_saved"].result()
+        except Exception as e:
+            print(f"Erro ao salvar a imagem, ela não será enviada ao CVAT: {e}")
+            return None
+        # As detecções ficam no manifesto do spool e viram pré-anotações da task no CVAT
+        spool.add(frame["image_path"], stream_key=frame["stream_key"], defects=frame["detections"]["defects"])
 
-        if len(metadata["defects"]) >= min_defects_to_save_image:
-            ################### SAVE IMAGE ###################
-            image_count += 1
-            save_image(image_matrix=matrix_image, image_count=image_count, path=IMAGE_SAVE_DIR)
-        
-            
         # Verificar se chegou no limite de 100 imagens e se podemos criar mais tasks hoje
-        if get_image_count_in_directory(directory=IMAGE_SAVE_DIR) >= NUM_IMG_PER_TASK and tasks_created_today < TASKS_PER_DAY:
-            print(f"Criando task {tasks_created_today + 1}/{TASKS_PER_DAY} de hoje...")
-            paths_imagens: list = get_path_imagens(diretorio_raiz=IMAGE_SAVE_DIR)
+        if spool.count() >= NUM_IMG_PER_TASK and state["tasks_created_today"] < TASKS_PER_DAY:
+            print(f"Criando task {state['tasks_created_today'] + 1}/{TASKS_PER_DAY} de hoje...")
+            entradas = spool.entries()
+            paths_imagens: list = [path for path, _ in entradas]
+            anotacoes = {path: info.get("defects", []) for path, info in entradas}
             data_hora_atual = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             task_name = f"New task date {data_hora_atual}"
 
-            if client.criar_task_com_imagens(image_paths=paths_imagens, project_id=project_id, task_name=task_name):
+            if client.criar_task_com_imagens(
+                    image_paths=paths_imagens, project_id=project_id, task_name=task_name, annotations=anotacoes):
                 # Se o envio foi bem-sucedido, limpar o diretório
-                clear_directory(IMAGE_SAVE_DIR)
-                image_paths.clear()  # Limpa a lista de caminhos de imagens
-                image_count = 0  # Reseta o contador de imagens
-                tasks_created_today += 1  # Incrementa o número de tasks criadas no dia
+                spool.clear()
+                with state_lock:
+                    state["image_count"] = 0  # Reseta o contador de imagens
+                state["tasks_created_today"] += 1  # Incrementa o número de tasks criadas no dia
             else:
                 print("Erro ao enviar imagens para o CVAT. Tentando novamente após 24 horas.")
 
         # Verifica se atingiu o limite diário de tasks criadas
-        if tasks_created_today >= TASKS_PER_DAY:
+        if state["tasks_created_today"] >= TASKS_PER_DAY:
+            # As filas cheias seguram os estágios anteriores até o fim da espera
             print(f"Limite de tasks atingido. Aguardando {CHECK_INTERVAL} s")
             time.sleep(CHECK_INTERVAL)  # Espera até o próximo dia (24 horas)
-            tasks_created_today = 0
+            state["tasks_created_today"] = 0
 
-        register_execution_time_gauge(time.perf_counter() - start_time)
+    ################### GET DATA FROM CAM SERVICE ###################
+    # Lê os dois streams em lotes; o próximo lote é buscado em segundo plano enquanto o atual é processado
+    stages = [Stage("decode", decode_frame, workers=DECODE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE)]
+    if gate.mode != "off":
+        stages.append(Stage("gate", gate_frame, workers=GATE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE))
+    pipeline = Pipeline(
+        source=redis_con.iter_stream(last_ids=last_ids, count=STREAM_BATCH_SIZE),
+        stages=stages + [
+            Stage("inference", infer_frames, workers=INFERENCE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE, batch_size=INFERENCE_BATCH_SIZE),
+            Stage("persistence", persist_frame, workers=PERSISTENCE_WORKERS, queue_size=PIPELINE_QUEUE_SIZE),
+            Stage("upload", upload_images, workers=UPLOAD_WORKERS, queue_size=PIPELINE_QUEUE_SIZE),
+        ])
+    try:
+        pipeline.run()
+    finally:
+        image_writer.close()
+        client.close()
 
 
 if __name__ == "__main__":
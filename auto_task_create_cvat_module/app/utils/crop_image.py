@@ -32,6 +32,53 @@ def find_borders_optimized(binary: np.ndarray, white_pixels_limit: float,
     # Calculate white pixel proportions using vectorized operations
     white_pixels_proportions = np.mean(binary[start_row:end_row, ignore:width-ignore] == 255, axis=0)
 
+    first_index, last_index, coil_center = _borders_from_proportions(white_pixels_proportions, white_pixels_limit, width, ignore)
+
+    return white_pixels_proportions, first_index, last_index, coil_center
+
+def find_borders_in_bands(binary: np.ndarray, bands: list):
+    """
+    Same as find_borders_optimized for several row bands of the image, with a single pass over it.
+
+    The white pixels of each column are counted once at the band boundaries and accumulated,
+    so the proportions of any band come from the difference of two cumulative rows.
+
+    Parameters:
+        binary (np.ndarray): The binary image to process.
+        bands (list): (white_pixels_limit, start_height_percent, end_height_percent) of each band.
+
+    Returns:
+        list: The find_borders_optimized result tuple of each band, in the same order.
+    """
+    height, width = binary.shape
+    ignore = 140  # columns ignored from each side of the image
+
+    band_rows = [(int(height * start), int(height * end)) for _, start, end in bands]
+    boundaries = sorted({0, height} | {row for rows in band_rows for row in rows})
+
+    # White pixels per column between consecutive boundaries, then accumulated
+    white_pixels = (binary[:, ignore:width-ignore] == 255).view(np.uint8)
+    cumulative = np.zeros((len(boundaries), white_pixels.shape[1]), dtype=np.int64)
+    for i, (start_row, end_row) in enumerate(zip(boundaries[:-1], boundaries[1:])):
+        segment_counts = cv2.reduce(white_pixels[start_row:end_row], 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S)
+        cumulative[i + 1] = cumulative[i] + segment_counts[0]
+    cumulative_at = dict(zip(boundaries, cumulative))
+
+    results = []
+    for (white_pixels_limit, _, _), (start_row, end_row) in zip(bands, band_rows):
+        white_pixels_proportions = (cumulative_at[end_row] - cumulative_at[start_row]) / (end_row - start_row)
+        first_index, last_index, coil_center = _borders_from_proportions(white_pixels_proportions, white_pixels_limit, width, ignore)
+        results.append((white_pixels_proportions, first_index, last_index, coil_center))
+
+    return results
+
+def _borders_from_proportions(white_pixels_proportions: np.ndarray, white_pixels_limit: float, width: int, ignore: int):
+    """
+    Finds the first and last border columns from the white pixel proportions of the columns.
+
+    Returns:
+        tuple: Index of the first border column, index of the last border column and the center column index.
+    """
     # Determine columns that exceed the white pixel limit
     valid_columns = white_pixels_proportions > white_pixels_limit
 
@@ -53,7 +100,7 @@ def find_borders_optimized(binary: np.ndarray, white_pixels_limit: float,
         first_index, last_index = ignore, width - ignore - 1
         coil_center = (first_index + last_index) // 2
 
-    return white_pixels_proportions, first_index, last_index, coil_center
+    return first_index, last_index, coil_center
 
 def find_borders(binary: MatLike, white_pixels_limit: float, start_height_percent:float = 0, end_height_percent: float = 1):
     # Obter largura e altura da imagem
@@ -104,7 +151,7 @@ def find_borders(binary: MatLike, white_pixels_limit: float, start_height_percen
     return white_pixels_per_column, first_ind, last_ind, coil_center
 
 
-def crop_and_measure(image: MatLike, mm_per_px: float = 1, border_size_px: int = 100, white_pixel_percentage_limit: float = 0.08, threshold1: int = 13, threshold2: int = 35, last_coil_center: int = -1, last_coil_width_mm: float = -1, compressionRatio = 1):
+def crop_and_measure(image: MatLike, mm_per_px: float = 1, border_size_px: int = 100, white_pixel_percentage_limit: float = 0.08, threshold1: int = 13, threshold2: int = 35, last_coil_center: int = -1, last_coil_width_mm: float = -1, compressionRatio = 1, edges_buffer: np.ndarray = None):
 
 #   Config
   max_coil_width = 1600
@@ -124,18 +171,27 @@ def crop_and_measure(image: MatLike, mm_per_px: float = 1, border_size_px: int =
   # Encontrar contornos na imagem canny
   canny_edges, _ = cv2.findContours(canny, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-  # Cria uma imagem com os contornos
-  edges_image = np.zeros((height, width, 3), dtype=np.uint8)
-  edges_image = cv2.cvtColor(edges_image, cv2.COLOR_BGR2GRAY)
-  cv2.drawContours(edges_image, canny_edges, -1, (255, 255, 255), 3)
-
-  # Realiza a detecção das bordas e ofsets
-  _, _, _, start_coil_center  = find_borders_optimized(edges_image, white_pixel_percentage_limit * 3, 0, 0.1)
-  _, first_ind, last_ind, coil_center  = find_borders_optimized(edges_image, white_pixel_percentage_limit, 0, 1)
-  _, _, _, end_coil_center  = find_borders_optimized(edges_image, white_pixel_percentage_limit * 3, 0.9, 1)
-
-  # Realiza a detecção da medida
-  _, first_ind_measure, last_ind_measure, _  = find_borders_optimized(edges_image, white_pixel_percentage_limit * 3, 0.45, 0.55)
+  # Cria uma imagem com os contornos, direto em um único canal
+  # edges_buffer (opcional) é reaproveitado entre chamadas quando tem o tamanho da imagem redimensionada
+  if edges_buffer is not None and edges_buffer.shape == (height, width) and edges_buffer.dtype == np.uint8:
+    edges_image = edges_buffer
+    edges_image.fill(0)
+  else:
+    edges_image = np.zeros((height, width), dtype=np.uint8)
+  cv2.drawContours(edges_image, canny_edges, -1, 255, 3)
+
+  # Realiza a detecção das bordas e ofsets (início, total e fim) e da medida, com uma única passada na imagem
+  (
+    (_, _, _, start_coil_center),
+    (_, first_ind, last_ind, coil_center),
+    (_, _, _, end_coil_center),
+    (_, first_ind_measure, last_ind_measure, _),
+  ) = find_borders_in_bands(edges_image, [
+    (white_pixel_percentage_limit * 3, 0, 0.1),
+    (white_pixel_percentage_limit, 0, 1),
+    (white_pixel_percentage_limit * 3, 0.9, 1),
+    (white_pixel_percentage_limit * 3, 0.45, 0.55),
+  ])
 
   # Redimensionar o index para compensar o resize do inicio
   start_coil_center =  int(start_coil_center / compressionRatio)
@@ -1,21 +1,137 @@
 from cvat_sdk import make_client
+from cvat_sdk.api_client import models
+from cvat_sdk.api_client.exceptions import ApiException
 import os
+import time
+import threading
+
+from utils.metrics_prometheus import register_cvat_task_upload
 
 class CVATClient:
-    def __init__(self, cvat_url: str, username: str, password: str):
+    def __init__(
+        self,
+        cvat_url: str,
+        username: str,
+        password: str,
+        image_quality: int = 90,
+        use_zip_chunks: bool = True,
+        use_cache: bool = True,
+        chunk_size: int = 4,
+        sorting_method: str = "natural",
+        segment_size: int = None,
+    ):
         """
-        Inicializa o cliente CVAT com as credenciais de login.
+        Inicializa o cliente CVAT com as credenciais de login e as opções de envio das tasks.
 
         Parâmetros:
         cvat_url (str): URL do servidor CVAT.
         username (str): Nome de usuário para autenticação.
         password (str): Senha para autenticação.
+        image_quality (int): Qualidade JPEG (1 a 100) dos chunks comprimidos gerados pelo CVAT.
+            As imagens originais são enviadas sem alteração.
+        use_zip_chunks (bool): Empacota os chunks como zip de imagens em vez de vídeo.
+        use_cache (bool): O servidor gera os chunks sob demanda, e a criação da task não
+            espera a preparação de todos eles.
+        chunk_size (int): Imagens por chunk. Imagens grandes pedem chunks pequenos, para
+            que o anotador não baixe dezenas de megabytes a cada troca de chunk. None deixa o CVAT decidir.
+        sorting_method (str): Ordem dos frames na task: lexicographical, natural, predefined ou random.
+        segment_size (int): Imagens por job. None gera um único job por task.
         """
         self.cvat_url = cvat_url
         self.username = username
         self.password = password
 
-        
+        # Opções de envio: data_params do create_from_data e campos do spec da task
+        self._data_params = {
+            "image_quality": image_quality,
+            "use_zip_chunks": use_zip_chunks,
+            "use_cache": use_cache,
+            "sorting_method": sorting_method,
+        }
+        if chunk_size:
+            self._data_params["chunk_size"] = chunk_size
+        self._segment_size = segment_size
+
+        # IDs dos labels de cada projeto (project_id -> {nome do label: ID}), buscados uma vez
+        self._label_ids = {}
+
+        # Cliente autenticado reaproveitado entre as chamadas: a conexão HTTP (keep-alive) e o
+        # token ficam abertos, sem um handshake TLS e um login a cada listagem ou envio
+        self._client = None
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Encerra a sessão com o CVAT e fecha as conexões abertas.
+        """
+        with self._lock:
+            if self._client is None:
+                return
+            try:
+                self._client.close()
+            except Exception as e:
+                print(f"Erro ao encerrar a sessão do CVAT: {e}")
+            finally:
+                self._client = None
+
+    def _obter_cliente(self):
+        """
+        Retorna o cliente autenticado, criando a sessão na primeira chamada.
+        """
+        with self._lock:
+            if self._client is None:
+                client = make_client(host=self.cvat_url)
+                try:
+                    client.login((self.username, self.password))
+                except Exception:
+                    client.close()
+                    raise
+                self._client = client
+            return self._client
+
+    def _executar(self, operacao, organization_slug: str = None, idempotente: bool = True):
+        """
+        Executa uma operação com o cliente persistente.
+
+        Se o token expirou (HTTP 401), refaz o login e repete a operação uma vez. Operações
+        que não são idempotentes não são repetidas: um 401 no meio delas pode chegar depois
+        de o servidor já ter aplicado parte da operação. A sessão é descartada e o erro propagado.
+
+        Parâmetros:
+        operacao (Callable): Função que recebe o cliente autenticado.
+        organization_slug (str, opcional): Organização usada na operação.
+        idempotente (bool): Se a operação pode ser repetida sem efeitos duplicados.
+
+        Retorna:
+        O retorno da operação.
+        """
+        with self._lock:
+            for tentativa in range(2):
+                client = self._obter_cliente()
+                client.organization_slug = organization_slug
+                try:
+                    return operacao(client)
+                except ApiException as e:
+                    if e.status != 401:
+                        raise
+                    # O próximo uso do cliente autentica novamente
+                    self.close()
+                    if not idempotente or tentativa == 1:
+                        raise
+                    print("Sessão do CVAT expirada, autenticando novamente.")
+
+    @staticmethod
+    def _validar_sessao(client):
+        """
+        Consulta o usuário autenticado, uma requisição barata que falha com 401 se o token expirou.
+        """
+        client.api_client.users_api.retrieve_self()
 
     def listar_projetos(self):
         """
@@ -24,29 +140,26 @@ class CVATClient:
         Retorna:
         list: Uma lista de dicionários contendo os detalhes dos projetos.
         """
+        def listar(client):
+            # Lista todos os projetos e adiciona os detalhes à lista de retorno
+            return [
+                {
+                    "ID": project.id,
+                    "Nome": project.name,
+                    "Status": project.status
+                }
+                for project in client.projects.list()
+            ]
+
         projetos = []
         try:
-            # Cria um cliente CVAT autenticado
-            with make_client(host=self.cvat_url) as client:
-                client.login((self.username, self.password))
-
-                # Lista todos os projetos
-                projects = client.projects.list()
-
-                # Adiciona os detalhes dos projetos à lista de retorno
-                for project in projects:
-                    projetos.append({
-                        "ID": project.id,
-                        "Nome": project.name,
-                        "Status": project.status
-                    })
-
+            projetos = self._executar(listar)
         except Exception as e:
             print(f"Erro ao listar projetos: {e}")
 
         return projetos
 
-    def criar_task_com_imagens(self, project_id: int, task_name: str, image_paths: list):
+    def criar_task_com_imagens(self, project_id: int, task_name: str, image_paths: list, annotations: dict = None):
         """
         Cria uma task no CVAT com base no ID do projeto e um array de imagens.
 
@@ -54,45 +167,122 @@ class CVATClient:
         project_id (int): ID do projeto onde a task será criada.
         task_name (str): Nome da task a ser criada.
         image_paths (list): Lista de caminhos para os arquivos de imagem.
+        annotations (dict, opcional): Caminho da imagem -> lista de defeitos detectados pelo
+            modelo, no formato do ModelManagerYolo ("Name" e bounding_box_*_px com o centro,
+            a largura e a altura em pixels). São enviados como pré-anotações da task.
 
         Retorna:
         dict: Detalhes da task criada, ou mensagem de erro.
         """
-        try:
-            # Cria um cliente CVAT autenticado
-            with make_client(host=self.cvat_url) as client:
-                client.login((self.username, self.password))
+        def criar(client):
+            # Prepara o payload para a criação da task
+            task_spec = {
+                "name": task_name,
+                "project_id": project_id,
+            }
+            if self._segment_size:
+                task_spec["segment_size"] = self._segment_size
 
-                client.organization_slug = "Argus"
+            # Verifica se todos os caminhos das imagens são válidos
+            for image_path in image_paths:
+                if not os.path.isfile(image_path):
+                    raise FileNotFoundError(f"A imagem '{image_path}' não foi encontrada.")
 
-                # Prepara o payload para a criação da task
-                task_spec = {
-                    "name": task_name,
-                    "project_id": project_id,
-                }
+            # Cria a task no CVAT, medindo o volume enviado e o tempo total da criação
+            bytes_sent = sum(os.path.getsize(image_path) for image_path in image_paths)
+            start_time = time.perf_counter()
+            task = client.tasks.create_from_data(
+                spec=task_spec, 
+                resources=image_paths,  # Passamos a lista de caminhos para as imagens
+                data_params=self._data_params
+            )
+            elapsed_time = time.perf_counter() - start_time
+            register_cvat_task_upload(bytes_sent, elapsed_time)
 
-                # Verifica se todos os caminhos das imagens são válidos
-                for image_path in image_paths:
-                    if not os.path.isfile(image_path):
-                        raise FileNotFoundError(f"A imagem '{image_path}' não foi encontrada.")
-
-                # Cria a task no CVAT
-                task = client.tasks.create_from_data(
-                    spec=task_spec, 
-                    resources=image_paths,  # Passamos a lista de caminhos para as imagens
-                    data_params={"quality": 100}
-                )
-
-                print(f"Task '{task.name}' criada com sucesso! ID da Task: {task.id}")
-                return {
-                    "ID": task.id,
-                    "Nome": task.name,
-                    "Projeto": task.project_id,
-                    "Status": task.status
-                }
+            print(f"Task '{task.name}' criada com sucesso! ID da Task: {task.id} "
+                  f"({bytes_sent / 1e6:.1f} MB em {elapsed_time:.1f} s)")
 
+            # As imagens já estão na task: uma falha nas anotações não desfaz o envio
+            num_annotations = 0
+            if annotations:
+                try:
+                    num_annotations = self._enviar_anotacoes(client, task, project_id, annotations)
+                    print(f"{num_annotations} pré-anotações enviadas para a task {task.id}")
+                except Exception as e:
+                    print(f"Erro ao enviar as pré-anotações da task {task.id}: {e}")
+
+            return {
+                "ID": task.id,
+                "Nome": task.name,
+                "Projeto": task.project_id,
+                "Status": task.status,
+                "Anotações": num_annotations,
+            }
+
+        try:
+            with self._lock:
+                # Renova a sessão antes de criar: um 401 dentro do create_from_data, depois de a task
+                # já existir, não é repetido, o que criaria uma segunda task com as mesmas imagens
+                self._executar(self._validar_sessao, organization_slug="Argus")
+                return self._executar(criar, organization_slug="Argus", idempotente=False)
         except Exception as e:
             print(f"Erro ao criar a task: {e}")
             return None
 
+    def _obter_ids_dos_labels(self, client, project_id: int) -> dict:
+        """
+        Retorna os IDs dos labels de um projeto, consultando o CVAT só na primeira vez.
+
+        Retorna:
+        dict: Nome do label -> ID do label.
+        """
+        if project_id not in self._label_ids:
+            labels = client.projects.retrieve(project_id).get_labels()
+            self._label_ids[project_id] = {label.name: label.id for label in labels}
+        return self._label_ids[project_id]
+
+    def _enviar_anotacoes(self, client, task, project_id: int, annotations: dict) -> int:
+        """
+        Envia as detecções do modelo como retângulos da task, numa única requisição.
+
+        Parâmetros:
+        client: Cliente CVAT autenticado.
+        task: Task recém-criada.
+        project_id (int): ID do projeto da task, de onde vêm os labels.
+        annotations (dict): Caminho da imagem -> lista de defeitos.
+
+        Retorna:
+        int: Número de retângulos enviados.
+        """
+        label_ids = self._obter_ids_dos_labels(client, project_id)
+
+        # O CVAT guarda o nome do arquivo de cada frame; o índice do frame vem da ordem na task
+        frames = {os.path.basename(frame.name): index for index, frame in enumerate(task.get_frames_info())}
+
+        shapes = []
+        unknown_labels = set()
+        for image_path, defects in annotations.items():
+            frame = frames.get(os.path.basename(image_path))
+            if frame is None:
+                continue
+            for defect in defects:
+                label_id = label_ids.get(defect["Name"])
+                if label_id is None:
+                    unknown_labels.add(defect["Name"])
+                    continue
+
+                x_center, y_center = defect["bounding_box_x_px"], defect["bounding_box_y_px"]
+                half_width, half_height = defect["bounding_box_width_px"] / 2, defect["bounding_box_height_px"] / 2
+                shapes.append(models.LabeledShapeRequest(
+                    type="rectangle",
+                    frame=frame,
+                    label_id=label_id,
+                    points=[x_center - half_width, y_center - half_height, x_center + half_width, y_center + half_height],
+                ))
+
+        if unknown_labels:
+            print(f"Classes do modelo sem label no projeto {project_id}, ignoradas: {', '.join(sorted(unknown_labels))}")
 
+        if shapes:
+            task.set_annotations(models.LabeledDataRequest(shapes=shapes))
+        return len(shapes)
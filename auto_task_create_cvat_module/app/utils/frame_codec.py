@@ -0,0 +1,134 @@
+import json
+import struct
+from typing import Dict
+
+import numpy as np
+
+# Binary frame layout, one Redis stream entry per frame:
+#   b"header": fixed size struct with the MetadataImage fields (see _HEADER)
+#   b"pixels": raw pixel buffer, decoded with np.frombuffer (no copy)
+#   b"meta":   optional JSON with any other key of the metadata dict
+HEADER_FIELD = b"header"
+PIXELS_FIELD = b"pixels"
+META_FIELD = b"meta"
+
+_MAGIC = b"ATCF"
+_VERSION = 1
+
+# magic, version, pixelformat, dtype, presence mask, then the MetadataImage fields
+_HEADER = struct.Struct("<4sBB4sH IIQIHIQdQQ")
+
+# MetadataImage fields carried in the header, in struct order
+HEADER_FIELDS = (
+    "width",
+    "height",
+    "bufferSizeBytes",
+    "strideBytes",
+    "bitsPerPixel",
+    "payloadType",
+    "validPayloadSizeBytes",
+    "timestamp",
+    "frameID",
+    "imageSize",
+)
+
+PIXEL_FORMATS = ("Mono8", "Mono12", "Mono12Packed")
+
+
+def encode_frame(metadata: dict) -> Dict[bytes, object]:
+    """
+    Encodes a metadata dict into the fields of a binary stream entry.
+
+    The camera image and the MetadataImage fields of metadata["camera"] go to the
+    header and pixel fields. Any other key is stored as JSON in the meta field.
+
+    Args:
+        metadata (dict): Frame metadata, with the image in metadata["camera"]["image"].
+
+    Returns:
+        Dict[bytes, object]: The stream entry fields.
+
+    Raises:
+        ValueError: If the pixel format is unknown.
+        TypeError: If the remaining metadata is not JSON serializable.
+    """
+    camera = dict(metadata["camera"])
+    image = np.ascontiguousarray(camera.pop("image"))
+    pixelformat = camera.pop("pixelformat")
+
+    if pixelformat not in PIXEL_FORMATS:
+        raise ValueError(f"Unknown pixel format '{pixelformat}'. Use one of: {', '.join(PIXEL_FORMATS)}.")
+
+    presence = 0
+    values = []
+    for bit, name in enumerate(HEADER_FIELDS):
+        value = camera.pop(name, None)
+        if value is not None:
+            presence |= 1 << bit
+        values.append(value or 0)
+
+    header = _HEADER.pack(
+        _MAGIC,
+        _VERSION,
+        PIXEL_FORMATS.index(pixelformat),
+        image.dtype.str.encode().ljust(4),
+        presence,
+        *values,
+    )
+
+    fields = {
+        HEADER_FIELD: header,
+        # The pixel buffer is handed to Redis without copying it into a bytes object
+        PIXELS_FIELD: memoryview(image).cast("B"),
+    }
+
+    extra = {key: value for key, value in metadata.items() if key != "camera"}
+    if camera:
+        extra["camera"] = camera
+    if extra:
+        fields[META_FIELD] = json.dumps(extra)
+
+    return fields
+
+
+def decode_frame(fields: Dict[bytes, bytes]) -> dict:
+    """
+    Decodes the fields of a binary stream entry back into a metadata dict.
+
+    The image is a flat, read-only vector viewing the Redis reply buffer.
+
+    Args:
+        fields (Dict[bytes, bytes]): The stream entry fields.
+
+    Returns:
+        dict: The frame metadata, in the same layout given to encode_frame.
+
+    Raises:
+        ValueError: If the header is not a supported binary frame.
+    """
+    header = fields[HEADER_FIELD]
+    if len(header) != _HEADER.size:
+        raise ValueError(f"Invalid frame header size: {len(header)} bytes, expected {_HEADER.size}.")
+
+    magic, version, pixelformat, dtype, presence, *values = _HEADER.unpack(header)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"Unsupported frame header: magic={magic!r}, version={version}.")
+
+    metadata = json.loads(fields[META_FIELD]) if META_FIELD in fields else {}
+    camera = metadata.setdefault("camera", {})
+
+    for bit, (name, value) in enumerate(zip(HEADER_FIELDS, values)):
+        if presence & (1 << bit):
+            camera[name] = value
+
+    camera["pixelformat"] = PIXEL_FORMATS[pixelformat]
+    camera["image"] = np.frombuffer(fields[PIXELS_FIELD], dtype=np.dtype(dtype.decode().strip()))
+
+    return metadata
+
+
+def is_binary_frame(fields: Dict[bytes, bytes]) -> bool:
+    """
+    Returns True if the stream entry fields hold a binary frame.
+    """
+    return HEADER_FIELD in fields
@@ -0,0 +1,123 @@
+from typing import Dict, Tuple
+
+import cv2
+import numpy as np
+
+from utils.image_processing import apply_simple_thresholding, apply_morphological_closing, apply_morphological_opening, convert_to_8bit
+
+GATE_MODES = ("off", "shadow", "on")
+
+
+class FrameGate:
+    """
+    Cheap check of whether a frame is worth a model forward pass.
+
+    The frame is downsampled and three statistics are computed on the small image:
+    the intensity variance, the density of Canny edges and the fraction of pixels that
+    stand out from their neighbourhood. Flat or dark frames with no edges and no local
+    anomaly are skipped.
+
+    The neighbourhood is estimated with a morphological opening and closing whose
+    elliptical kernel is wide on the small image: the white and black top-hats keep
+    every bright or dark structure narrower than the kernel, from a 1 px scratch to a
+    blob a few percent of the frame wide, while the straight coil edges are preserved
+    by both operations and do not count. The area downsampling already averages the
+    sensor noise away.
+
+    Attributes:
+        mode (str): 'off' passes every frame, 'shadow' evaluates the gate but passes every
+            frame (to measure it before enabling), 'on' skips the frames it rejects.
+    """
+
+    def __init__(
+        self,
+        mode: str = "off",
+        downsample_width: int = 256,
+        min_variance: float = 25.0,
+        min_edge_density: float = 0.02,
+        anomaly_threshold: int = 25,
+        min_anomaly_fraction: float = 0.0001,
+        background_kernel: int = 31,
+    ) -> None:
+        """
+        Initializes the gate.
+
+        Args:
+            mode (str): One of 'off', 'shadow' or 'on'.
+            downsample_width (int): Width of the downsampled image, the aspect ratio is kept.
+            min_variance (float): Frames with a lower 8-bit intensity variance are empty (no coil).
+            min_edge_density (float): Minimum fraction of edge pixels for a frame to pass.
+            anomaly_threshold (int): Minimum 8-bit difference to the local median for a pixel to be anomalous.
+            min_anomaly_fraction (float): Minimum fraction of anomalous pixels for a frame to pass.
+            background_kernel (int): Odd diameter, in downsampled pixels, of the kernel estimating the
+                local background. Anomalies up to about this size stand out.
+
+        Raises:
+            ValueError: If the mode is unknown or the background kernel is not odd.
+        """
+        if mode not in GATE_MODES:
+            raise ValueError(f"Unknown gate mode '{mode}'. Use one of: {', '.join(GATE_MODES)}.")
+        if background_kernel % 2 == 0:
+            raise ValueError(f"The background kernel must be odd, got {background_kernel}.")
+
+        self.mode = mode
+        self._downsample_width = downsample_width
+        self._min_variance = min_variance
+        self._min_edge_density = min_edge_density
+        self._anomaly_threshold = anomaly_threshold
+        self._min_anomaly_fraction = min_anomaly_fraction
+        self._background_kernel = background_kernel
+
+    def statistics(self, image: np.ndarray) -> Dict[str, float]:
+        """
+        Computes the gate statistics of a grayscale frame.
+
+        Args:
+            image (np.ndarray): Grayscale frame, uint8 or 12-bit values in uint16.
+
+        Returns:
+            Dict[str, float]: variance, edge_density and anomaly_fraction.
+        """
+        height, width = image.shape[:2]
+        scale = min(1.0, self._downsample_width / width)
+        small_size = (max(int(width * scale), 1), max(int(height * scale), 1))
+        small = convert_to_8bit(cv2.resize(image, small_size, interpolation=cv2.INTER_AREA))
+
+        _, std = cv2.meanStdDev(small)
+        edges = cv2.Canny(small, 50, 150)
+
+        # Replicated borders extend the coil edges straight out of the frame, so the opening
+        # and closing do not cut the corners where the edges meet the top and bottom rows
+        margin = self._background_kernel // 2
+        padded = cv2.copyMakeBorder(small, margin, margin, margin, margin, cv2.BORDER_REPLICATE)
+        kernel = (self._background_kernel, self._background_kernel)
+        brighter = cv2.subtract(padded, apply_morphological_opening(padded, kernel, 1))
+        darker = cv2.subtract(apply_morphological_closing(padded, kernel, 1), padded)
+        contrast = cv2.max(brighter, darker)[margin:margin + small.shape[0], margin:margin + small.shape[1]]
+        anomalies = apply_simple_thresholding(contrast, self._anomaly_threshold)
+
+        pixels = small.size
+        return {
+            "variance": float(std[0, 0] ** 2),
+            "edge_density": cv2.countNonZero(edges) / pixels,
+            "anomaly_fraction": cv2.countNonZero(anomalies) / pixels,
+        }
+
+    def evaluate(self, image: np.ndarray) -> Tuple[bool, Dict[str, float]]:
+        """
+        Decides whether a frame may contain defects, regardless of the mode.
+
+        Args:
+            image (np.ndarray): Grayscale frame.
+
+        Returns:
+            Tuple[bool, Dict[str, float]]: True if the frame has candidate anomalies, and the statistics.
+        """
+        stats = self.statistics(image)
+        if stats["variance"] < self._min_variance:
+            return False, stats
+        has_candidates = (
+            stats["edge_density"] >= self._min_edge_density
+            or stats["anomaly_fraction"] >= self._min_anomaly_fraction
+        )
+        return has_candidates, stats
@@ -1,18 +1,45 @@
+import logging
+import threading
+from collections import deque
+
 import cv2
 import numpy as np
 
 
+OVERFLOW_POLICIES = ("drop_oldest", "block")
+
+
 class ImageConcatenator:
     """
     Class for concatenating images.
 
+    The concatenated images are stitched into a fixed pool of preallocated canvases.
+    Completed canvases wait in a FIFO until popped, and go back to the pool once the
+    consumer releases them, so memory stays flat however slow the consumer is.
+
+    Breaking change: pop used to return an array owned by the caller. It now returns a
+    view of a pooled canvas that the caller must give back with release, and must not
+    use afterwards. A caller that never releases keeps its canvases out of the pool:
+    under 'block' fill then waits for them, under 'drop_oldest' every new image is
+    recycled before it can be popped.
+
     Attributes:
-        id (int): Identifier for the ImageConcatenator instance.
         num_of_images (int): Number of images required for concatenation.
-        image (numpy.ndarray): The concatenated image array.
+        image (numpy.ndarray): The canvas being filled.
+        capacity (int): Number of canvases in the pool.
+        overflow (str): What fill does when every canvas is in use, 'drop_oldest' or 'block'.
+        dropped (int): Number of completed images discarded by the 'drop_oldest' policy.
     """
 
-    def __init__(self, width: int, height: int, concat_height: int) -> None:
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        concat_height: int,
+        capacity: int = 4,
+        overflow: str = "drop_oldest",
+        timeout: float = None,
+    ) -> None:
         """
         Initializes a new ImageConcatenator object with given dimensions.
 
@@ -20,14 +47,39 @@ class ImageConcatenator:
             width (int): Width of the image.
             height (int): Height of the image.
             concat_height (int): Desired height for the concatenated image.
+            capacity (int): Number of preallocated canvases, including the one being filled. At least 2.
+            overflow (str): When a canvas completes and no free one is left, 'drop_oldest'
+                recycles the oldest completed image not yet popped (the one just completed
+                if it is the only one) and never waits, 'block' waits for a release.
+            timeout (float): Maximum seconds fill waits for a free canvas under 'block'. None waits forever.
+
+        Raises:
+            ValueError: If the capacity or the overflow policy are invalid.
         """
+        if capacity < 2:
+            raise ValueError(f"The capacity must be at least 2, got {capacity}.")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{overflow}'. Use one of: {', '.join(OVERFLOW_POLICIES)}.")
+
         self._width = width
         self._height = height
         self._final_concat_height = (concat_height // height) * height
         self.num_of_images = self._final_concat_height // self._height
-        self.image = np.zeros((self._final_concat_height, self._width), dtype=np.uint8)
+        self.capacity = capacity
+        self.overflow = overflow
+        self.dropped = 0
+        self._timeout = timeout
+
+        self._canvases = [
+            np.zeros((self._final_concat_height, self._width), dtype=np.uint8) for _ in range(capacity)
+        ]
+        self._free = deque(range(1, capacity))
+        self._ready = deque()
+        self._current = 0
+        self._condition = threading.Condition()
+
+        self.image = self._canvases[self._current]
         self._idx = 0
-        self._image_list = []
 
     def __str__(self) -> str:
         """Return a string representation of the instance."""
@@ -36,24 +88,86 @@ class ImageConcatenator:
             f"Required images: {self.num_of_images}"
         )
 
+    def __len__(self) -> int:
+        """Return the number of completed images waiting to be popped."""
+        return len(self._ready)
+
     def _reset(self) -> None:
         """
-        Resets the image and index for a new set of images.
+        Queues the completed canvas and takes a free one for the next set of images.
+
+        Raises:
+            TimeoutError: If the 'block' policy waited longer than the timeout.
         """
-        self.image = np.zeros((self._final_concat_height, self._width), dtype=np.uint8)
+        with self._condition:
+            self._ready.append(self._current)
+            self._current = None
+            self._condition.notify_all()
+
         self._idx = 0
+        self._acquire()
+
+    def _acquire(self) -> None:
+        """
+        Takes a free canvas to fill. The canvas is not cleared, every row is overwritten
+        before it completes again.
+
+        Raises:
+            TimeoutError: If the 'block' policy waited longer than the timeout. The next fill retries.
+        """
+        with self._condition:
+            # Never waits: the canvas just queued by _reset can always be recycled, even when
+            # the consumer holds every other canvas (that image is then the one dropped)
+            if not self._free and self.overflow == "drop_oldest" and self._ready:
+                self._free.append(self._ready.popleft())
+                self.dropped += 1
+                logging.warning(f"ImageConcatenator full, dropped the oldest image ({self.dropped} dropped)")
+
+            # Every canvas is queued or held by consumers: wait for one to be released
+            if not self._condition.wait_for(lambda: self._free, timeout=self._timeout):
+                raise TimeoutError(f"No free canvas released within {self._timeout} s.")
+
+            self._current = self._free.popleft()
+            self.image = self._canvases[self._current]
 
     def pop(self) -> np.ndarray:
         """
-        Removes and returns the first image in the image list.
+        Removes and returns the oldest completed image.
+
+        The image is a view of a pooled canvas, it must be given back with release once
+        the caller is done with it and must not be used afterwards.
 
         Returns:
-            np.ndarray: The first image in the image list, if available.
+            np.ndarray: The oldest completed image, if available.
+        """
+        with self._condition:
+            if not self._ready:
+                return None
+            return self._canvases[self._ready.popleft()].view()
+
+    def release(self, image: np.ndarray) -> None:
+        """
+        Gives a popped image back to the pool, so its canvas can be filled again.
+
+        Args:
+            image (np.ndarray): An image returned by pop.
+
+        Raises:
+            ValueError: If the image does not come from this pool or was already released.
         """
-        if not self._image_list:
-            return None
-        image = self._image_list.pop(0)
-        return image
+        canvas = image if image.base is None else image.base
+        with self._condition:
+            for index, pooled in enumerate(self._canvases):
+                if pooled is canvas:
+                    break
+            else:
+                raise ValueError("The image does not belong to this ImageConcatenator.")
+
+            if index == self._current or index in self._free or index in self._ready:
+                raise ValueError("The image was not popped or was already released.")
+
+            self._free.append(index)
+            self._condition.notify_all()
 
     def show(self) -> None:
         """
@@ -74,14 +188,19 @@ class ImageConcatenator:
 
         Args:
             image (np.ndarray): The image to be concatenated.
+
+        Raises:
+            TimeoutError: If the image completed a canvas and no free one was released in time.
         """
+        if self._current is None:
+            self._acquire()
+
         start_idx = self._idx * self._height
         end_idx = (self._idx + 1) * self._height
         self.image[start_idx:end_idx, :] = image.view()
         self._idx += 1
 
         if self._idx >= self.num_of_images:
-            self._image_list.append(self.image)
             self._reset()
 
     def fill_from_bottom(self, image: np.ndarray) -> None:
@@ -90,7 +209,13 @@ class ImageConcatenator:
 
         Args:
             image (np.ndarray): The image to be concatenated.
+
+        Raises:
+            TimeoutError: If the image completed a canvas and no free one was released in time.
         """
+        if self._current is None:
+            self._acquire()
+
         # Calculate the starting and ending indices in reverse order
         end_idx = self.image.shape[0] - (self._idx * self._height)
         start_idx = end_idx - self._height
@@ -101,5 +226,4 @@ class ImageConcatenator:
 
         # Check if the image limit is reached and handle accordingly
         if self._idx >= self.num_of_images:
-            self._image_list.append(self.image)
             self._reset()
\ No newline at end of file
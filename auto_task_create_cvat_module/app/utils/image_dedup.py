@@ -0,0 +1,160 @@
+import threading
+
+import cv2
+import numpy as np
+
+from utils.image_processing import MONO12_TO_8BIT_SCALE
+
+DEDUP_MODES = ("off", "shadow", "on")
+
+# Number of set bits of each byte value
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint16)
+
+
+def dhash(image: np.ndarray, hash_size: int = 16, margin: float = 2.0) -> np.ndarray:
+    """
+    Computes the difference hash (dHash) of an image.
+
+    The image is shrunk to (hash_size + 1) x hash_size pixels and each bit tells whether
+    a pixel is brighter than its left neighbour by more than the margin. Near-identical
+    images give hashes a few bits apart, whatever the noise or compression.
+
+    The margin matters on coil images: most of the grid falls on a flat surface, where a
+    plain brighter/darker comparison would flip with the sensor noise.
+
+    Args:
+        image (np.ndarray): Grayscale or BGR image, uint8 or 12-bit values in uint16.
+        hash_size (int): Side of the hash grid. The hash has hash_size ** 2 bits.
+        margin (float): Minimum brightness step, in 8-bit gray levels, for a bit to be set.
+
+    Returns:
+        np.ndarray: The hash packed into a uint8 vector of hash_size ** 2 / 8 bytes.
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if image.dtype == np.uint16:
+        margin /= MONO12_TO_8BIT_SCALE
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return np.packbits(small[:, 1:] - small[:, :-1] > margin)
+
+
+def detection_signature(detections: np.ndarray, cell_size: float = 32.0) -> bytes:
+    """
+    Summarizes the detections of a frame as their classes and quantized centers.
+
+    A small defect barely changes the hash of a whole frame, so two frames are only
+    duplicates when they also have the same defects at the same places.
+
+    Args:
+        detections (np.ndarray): Structured array with class_id, cx and cy fields.
+        cell_size (float): Side, in pixels, of the grid the centers are snapped to.
+
+    Returns:
+        bytes: The sorted (class_id, cell x, cell y) rows, comparable with ==.
+    """
+    rows = np.empty((len(detections), 3), dtype=np.int64)
+    rows[:, 0] = detections["class_id"]
+    rows[:, 1] = np.floor(detections["cx"] / cell_size)
+    rows[:, 2] = np.floor(detections["cy"] / cell_size)
+    rows = rows[np.lexsort(rows.T[::-1])]
+    return rows.tobytes()
+
+
+class ImageDeduplicator:
+    """
+    Drops images that are near-duplicates of a recently kept one.
+
+    An image is a duplicate when its dHash is close to the hash of a recently kept image
+    and both have the same detections (classes and quantized centers). The hashes of the
+    last kept images live in a fixed ring of packed bit vectors, so a lookup is one
+    vectorized XOR and popcount over the whole index.
+
+    Attributes:
+        mode (str): 'off' keeps every image without hashing it, 'shadow' checks every image
+            but keeps it (to measure the deduplication before enabling), 'on' drops duplicates.
+        max_distance (int): Maximum Hamming distance between the hashes of duplicates.
+        duplicates (int): Number of images reported as duplicates.
+    """
+
+    def __init__(
+        self,
+        mode: str = "off",
+        hash_size: int = 16,
+        max_distance: int = 1,
+        capacity: int = 256,
+        margin: float = 2.0,
+        cell_size: float = 32.0,
+    ) -> None:
+        """
+        Initializes an empty index.
+
+        Args:
+            mode (str): One of 'off', 'shadow' or 'on'.
+            hash_size (int): Side of the dHash grid, a multiple of 4 so the hash packs into whole bytes.
+            max_distance (int): Maximum Hamming distance, out of hash_size ** 2 bits, for two images to be duplicates.
+            capacity (int): Number of recent hashes kept. The oldest is overwritten when it is full.
+            margin (float): Brightness step of the dHash bits, in 8-bit gray levels.
+            cell_size (float): Grid, in pixels, the detection centers are snapped to before comparing them.
+
+        Raises:
+            ValueError: If the mode is unknown or the hash size does not pack into whole bytes.
+        """
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode '{mode}'. Use one of: {', '.join(DEDUP_MODES)}.")
+        if (hash_size * hash_size) % 8:
+            raise ValueError(f"The hash size must be a multiple of 4, got {hash_size}.")
+
+        self.mode = mode
+        self.max_distance = max_distance
+        self.duplicates = 0
+        self._hash_size = hash_size
+        self._margin = margin
+        self._cell_size = cell_size
+        self._hashes = np.zeros((capacity, hash_size * hash_size // 8), dtype=np.uint8)
+        self._signatures = [None] * capacity
+        self._count = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def distance(self, image: np.ndarray) -> int:
+        """
+        Returns the Hamming distance from an image to the nearest hash in the index, or None if it is empty.
+        """
+        image_hash = dhash(image, self._hash_size, self._margin)
+        with self._lock:
+            distances = self._distances(image_hash)
+            return int(distances.min()) if len(distances) else None
+
+    def is_duplicate(self, image: np.ndarray, detections: np.ndarray) -> bool:
+        """
+        Checks an image against the index and adds it when it is new.
+
+        Duplicates are not added, so a slowly drifting scene is kept again once it moved
+        far enough from the last kept image.
+
+        Args:
+            image (np.ndarray): The image to check.
+            detections (np.ndarray): Detections of the image, a structured array with class_id, cx and cy fields.
+
+        Returns:
+            bool: True if the image is a near-duplicate of a recently kept one. Always False in 'off' mode.
+        """
+        if self.mode == "off":
+            return False
+
+        image_hash = dhash(image, self._hash_size, self._margin)
+        signature = detection_signature(detections, self._cell_size)
+        with self._lock:
+            close = np.flatnonzero(self._distances(image_hash) <= self.max_distance)
+            if any(self._signatures[slot] == signature for slot in close):
+                self.duplicates += 1
+                return True
+
+            self._hashes[self._next] = image_hash
+            self._signatures[self._next] = signature
+            self._next = (self._next + 1) % len(self._hashes)
+            self._count = min(self._count + 1, len(self._hashes))
+        return False
+
+    def _distances(self, image_hash: np.ndarray) -> np.ndarray:
+        return _POPCOUNT[np.bitwise_xor(self._hashes[:self._count], image_hash)].sum(axis=1)
@@ -8,7 +8,7 @@ import pickle
 class ImageHandler:
         
     @staticmethod
-    def convert_image_grey_scale_vector_to_matrix(image_vector: np.ndarray, height: int, width: int, mode: str) -> np.ndarray:
+    def convert_image_grey_scale_vector_to_matrix(image_vector: np.ndarray, height: int, width: int, mode: str, out: np.ndarray = None) -> np.ndarray:
         """
         Convert a grayscale image represented as a vector to a matrix.
 
@@ -20,28 +20,35 @@ class ImageHandler:
                 - '8-bit': for 8-bit grayscale images.
                 - '12-bit': for 12-bit grayscale images.
                 - '12-bit packed': for 12-bit packed grayscale images.
+            out (numpy.ndarray, optional): Preallocated uint16 buffer with height * width
+                elements, reused to unpack 'Mono12Packed' images. Ignored by the other modes.
 
         Returns:
             numpy.ndarray: The matrix representation of the grayscale image.
 
         Raises:
-            ValueError: If an unknown mode is provided.
+            ValueError: If an unknown mode is provided or the vector size does not match the image size.
         """
         # Get the original shape from the metadata
         original_shape = (height, width)
 
         if mode == 'Mono8':
-            # Cast the data to 8-bit integers
-            unpacked_data = image_vector.astype(np.uint8)
+            # Cast the data to 8-bit integers (no copy if it already is)
+            unpacked_data = image_vector.astype(np.uint8, copy=False)
         
         elif mode == 'Mono12':
-            # Cast the data to 16-bit integers
-            unpacked_data = image_vector.astype(np.uint16) 
+            # Cast the data to 16-bit integers (no copy if it already is)
+            unpacked_data = image_vector.astype(np.uint16, copy=False) 
 
         elif mode == 'Mono12Packed':
+            # Two pixels are packed in every 3 bytes
+            if (height * width) % 2 != 0 or image_vector.size != (height * width * 3) // 2:
+                raise ValueError(
+                    f"Invalid packed data size: {image_vector.size} bytes for a {height}x{width} image, "
+                    f"expected {(height * width * 3) // 2}.")
+
             # Unpack the 12-bit packed data into 16-bit pixel values
-            #unpacked_data = ImageHandler.__unpack_12bit(image_vector)
-            raise ValueError(" The '12-bit packet method has not yet been implemented ")
+            unpacked_data = ImageHandler.__unpack_12bit(image_vector, out=out)
             
         else:
             raise ValueError("Unknown mode - The mode should be: 8-bit, 12-bit, 12-bit packed. ")
@@ -51,21 +58,68 @@ class ImageHandler:
         return original_matrix
 
     @staticmethod
-    def __unpack_12bit(image_vector):
+    def __unpack_12bit(image_vector: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Unpack 12-bit packed data, 2 pixels in every 3 bytes, into 16-bit pixel values.
+
+        Byte layout of each pair of pixels (p0, p1):
+            b0 = p0 bits 0-7
+            b1 = p0 bits 8-11 (low nibble) | p1 bits 0-3 (high nibble)
+            b2 = p1 bits 4-11
+
+        Args:
+            image_vector (numpy.ndarray): The packed bytes.
+            out (numpy.ndarray, optional): Preallocated uint16 output with 2/3 of the input size.
+
+        Returns:
+            numpy.ndarray: The unpacked pixels, as a flat uint16 vector.
+        """
         if image_vector.size % 3 != 0:
             raise ValueError("Invalid packed data size. Must be a multiple of 3.")
 
         unpacked_size = (image_vector.size // 3) * 2
-        result = np.zeros(unpacked_size, dtype=np.uint16)
+        if out is None:
+            out = np.empty(unpacked_size, dtype=np.uint16)
+        elif out.dtype != np.uint16 or out.size != unpacked_size:
+            raise ValueError(f"Invalid output buffer: expected {unpacked_size} uint16 elements.")
 
-        # Ensure contiguous array for reliable slicing
-        image_vector = np.ascontiguousarray(image_vector, dtype=np.uint16)
-        
-        # Unpack
-        result[0::2] = ((image_vector[1::3] & 0x0F) << 8) | image_vector[0::3]
-        result[1::2] = (image_vector[1::3] >> 4) | ((image_vector[2::3] & 0xFF) << 4)
-        
-        return result
+        # View the bytes as (N, 3) triplets and the output as (N, 2) pairs, without copies
+        triplets = np.ascontiguousarray(image_vector, dtype=np.uint8).reshape(-1, 3)
+        pairs = out.reshape(-1, 2)
+        b0, b1, b2 = triplets[:, 0], triplets[:, 1], triplets[:, 2]
+        p0, p1 = pairs[:, 0], pairs[:, 1]
+
+        # Unpack straight into the output, the only temporaries are uint8 nibbles
+        np.left_shift(b1 & 0x0F, 8, out=p0, dtype=np.uint16)
+        np.bitwise_or(p0, b0, out=p0)
+        np.left_shift(b2, 4, out=p1, dtype=np.uint16)
+        np.bitwise_or(p1, b1 >> 4, out=p1)
+
+        return out
+
+    @staticmethod
+    def __pack_12bit(image_matrix: np.ndarray) -> np.ndarray:
+        """
+        Pack 16-bit pixel values into 12-bit packed data, the inverse of __unpack_12bit.
+
+        Args:
+            image_matrix (numpy.ndarray): The pixels, with an even number of elements.
+
+        Returns:
+            numpy.ndarray: The packed bytes, as a flat uint8 vector.
+        """
+        if image_matrix.size % 2 != 0:
+            raise ValueError("Invalid image size. Must have an even number of pixels.")
+
+        pairs = np.ascontiguousarray(image_matrix, dtype=np.uint16).reshape(-1, 2)
+        p0, p1 = pairs[:, 0], pairs[:, 1]
+
+        triplets = np.empty((pairs.shape[0], 3), dtype=np.uint8)
+        triplets[:, 0] = p0 & 0xFF
+        triplets[:, 1] = ((p0 >> 8) & 0x0F) | ((p1 & 0x0F) << 4)
+        triplets[:, 2] = (p1 >> 4) & 0xFF
+
+        return triplets.reshape(-1)
     
 
     @staticmethod
@@ -80,9 +134,11 @@ class ImageHandler:
             image_vector = image_matrix.reshape(-1)
 
         elif mode == 'Mono12Packed':
-            raise ValueError(" The '12-bit packet method has not yet been implemented ")
-            # Unpack the 12-bit packed data into 16-bit pixel values
-            #unpacked_data = ImageHandler.__unpack_12bit(image_matrix)
+            # Pack the 16-bit pixel values into 12-bit packed data
+            image_vector = ImageHandler.__pack_12bit(image_matrix)
+
+        else:
+            raise ValueError("Unknown mode - The mode should be: 8-bit, 12-bit, 12-bit packed. ")
 
         return image_vector
     
@@ -1,4 +1,16 @@
 import cv2
+import numpy as np
+
+# Mono12 frames arrive as uint16 holding 12-bit values
+MONO12_TO_8BIT_SCALE = 255.0 / 4095.0
+
+
+def convert_to_8bit(image):
+    """Scale a 12-bit image stored as uint16 down to uint8. uint8 images are returned as is."""
+    if image.dtype == np.uint8:
+        return image
+    return cv2.convertScaleAbs(image, alpha=MONO12_TO_8BIT_SCALE)
+
 
 def apply_simple_thresholding(image, th_value=18):
     "Apply simple thresholding to a given image"
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from utils.image_processing import convert_to_8bit
+from utils.metrics_prometheus import register_image_encode_time, register_image_bytes_written
+
+# Supported formats: file extension of each one
+IMAGE_FORMATS = {
+    "png": "png",
+    "webp": "webp",
+    "jpeg": "jpg",
+}
+
+
+class ImageWriter:
+    """
+    Encodes and writes images on a pool of worker threads.
+
+    Attributes:
+        image_format (str): Output format, one of 'png', 'webp' (lossless) or 'jpeg'.
+        extension (str): File extension matching the output format.
+    """
+
+    def __init__(
+        self,
+        image_format: str = "png",
+        png_compression: int = 1,
+        jpeg_quality: int = 95,
+        workers: int = 2,
+        queue_size: int = 16,
+    ) -> None:
+        """
+        Initializes the writer pool.
+
+        Args:
+            image_format (str): Output format, one of 'png', 'webp' (lossless) or 'jpeg'.
+            png_compression (int): PNG compression level, from 0 (fastest) to 9 (smallest).
+            jpeg_quality (int): JPEG quality, from 0 to 100.
+            workers (int): Number of encoding/writing threads.
+            queue_size (int): Maximum number of images waiting to be written. submit blocks when it is reached.
+
+        Raises:
+            ValueError: If the format is not supported.
+        """
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unknown image format '{image_format}'. Use one of: {', '.join(IMAGE_FORMATS)}.")
+
+        self.image_format = image_format
+        self.extension = IMAGE_FORMATS[image_format]
+
+        if image_format == "png":
+            self._params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+        elif image_format == "webp":
+            # OpenCV encodes WebP losslessly for quality above 100
+            self._params = [cv2.IMWRITE_WEBP_QUALITY, 101]
+        else:
+            self._params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-writer")
+        # Queued plus in-flight images, so a slow disk blocks the producer instead of piling frames in memory
+        self._slots = threading.BoundedSemaphore(queue_size + workers)
+
+    def encode(self, image: np.ndarray) -> np.ndarray:
+        """
+        Encodes an image in the configured format.
+
+        PNG keeps 16-bit images as they are. WebP and JPEG only encode 8-bit images, so
+        12-bit frames stored as uint16 (Mono12, Mono12Packed) are scaled down to 8 bits.
+
+        Args:
+            image (np.ndarray): The image to encode, uint8 or 12-bit values in uint16.
+
+        Returns:
+            np.ndarray: The encoded bytes.
+
+        Raises:
+            ValueError: If OpenCV fails to encode the image.
+        """
+        start_time = time.perf_counter()
+        if self.image_format != "png":
+            image = convert_to_8bit(image)
+        success, buffer = cv2.imencode(f".{self.extension}", image, self._params)
+        register_image_encode_time(self.image_format, time.perf_counter() - start_time)
+
+        if not success:
+            raise ValueError(f"Failed to encode image as {self.image_format}.")
+        return buffer
+
+    def write(self, image: np.ndarray, path: str) -> str:
+        """
+        Encodes an image and writes it to disk, blocking the caller.
+
+        Args:
+            image (np.ndarray): The image to write.
+            path (str): Destination path, including the extension.
+
+        Returns:
+            str: The path of the written image.
+        """
+        buffer = self.encode(image)
+        with open(path, "wb") as file:
+            file.write(buffer.data)
+
+        register_image_bytes_written(self.image_format, buffer.nbytes)
+        logging.info(f"Image saved: {path}")
+        return path
+
+    def submit(self, image: np.ndarray, path: str) -> Future:
+        """
+        Queues an image to be written by the pool. Blocks while the queue is full.
+
+        The image must not be modified until the returned future is done.
+
+        Args:
+            image (np.ndarray): The image to write.
+            path (str): Destination path, including the extension.
+
+        Returns:
+            Future: Resolves to the path of the written image.
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self.write, image, path)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self) -> None:
+        """
+        Waits for the queued images to be written and stops the pool.
+        """
+        self._executor.shutdown(wait=True)
@@ -6,6 +6,16 @@ LOG_MESSAGES_SUMMARY = Summary('log_messages_summary', 'Summary of log messages'
 CPU_USAGE = Gauge('cpu_usage_percent', 'CPU usage percentage')
 LOOP_EXECUTION_TIME_GAUGE = Gauge('loop_execution_time_seconds', 'Time taken for each loop iteration')
 LARGEST_MEASUREMENT_WIDTH_GAUGE =  Gauge('largest_measurement_width', 'largest measurement width')
+PIPELINE_STAGE_TIME_SUMMARY = Summary('pipeline_stage_time_seconds', 'Time spent by a pipeline stage on each item', ['stage'])
+PIPELINE_QUEUE_SIZE_GAUGE = Gauge('pipeline_queue_size', 'Number of items waiting in the input queue of a pipeline stage', ['stage'])
+IMAGE_ENCODE_TIME_SUMMARY = Summary('image_encode_time_seconds', 'Time spent encoding images to be saved', ['format'])
+IMAGE_BYTES_WRITTEN_COUNTER = Counter('image_bytes_written_total', 'Total number of bytes of saved images', ['format'])
+FRAME_GATE_DECISION_COUNTER = Counter('frame_gate_decisions_total', 'Frames evaluated by the pre-inference gate, by decision', ['decision'])
+IMAGE_DEDUP_COUNTER = Counter('image_dedup_total', 'Images checked against the recent hashes before saving, by result', ['result'])
+INFERENCE_CACHE_LOOKUP_COUNTER = Counter('inference_cache_lookups_total', 'Inference cache lookups, by tier that answered (memory, disk) or miss', ['result'])
+CVAT_UPLOAD_BYTES_COUNTER = Counter('cvat_upload_bytes_total', 'Total number of image bytes sent to CVAT when creating tasks')
+CVAT_TASK_CREATE_TIME_SUMMARY = Summary('cvat_task_create_time_seconds', 'Wall time of the creation of a CVAT task with its images')
+FRAME_GATE_MISSED_COUNTER = Counter('frame_gate_missed_total', 'Frames rejected by the gate in which the model found defects (shadow mode)')
 
 def detect_and_log_frame_loss_couter(frame_id_current, frame_id_ant=None):    
     if frame_id_ant is not None and frame_id_current != frame_id_ant + 1:
@@ -41,3 +51,32 @@ def largest_measurement_width(width):
         LARGEST_MEASUREMENT_WIDTH_GAUGE.set(width)
 
 
+
+
+def register_pipeline_stage_time(stage, execution_time):
+        PIPELINE_STAGE_TIME_SUMMARY.labels(stage=stage).observe(execution_time)
+
+def register_pipeline_queue_size(stage, size):
+        PIPELINE_QUEUE_SIZE_GAUGE.labels(stage=stage).set(size)
+
+def register_image_encode_time(image_format, execution_time):
+        IMAGE_ENCODE_TIME_SUMMARY.labels(format=image_format).observe(execution_time)
+
+def register_image_bytes_written(image_format, size):
+        IMAGE_BYTES_WRITTEN_COUNTER.labels(format=image_format).inc(size)
+
+def register_frame_gate_decision(decision):
+        FRAME_GATE_DECISION_COUNTER.labels(decision=decision).inc()
+
+def register_frame_gate_miss():
+        FRAME_GATE_MISSED_COUNTER.inc()
+
+def register_image_dedup(result):
+        IMAGE_DEDUP_COUNTER.labels(result=result).inc()
+
+def register_inference_cache_lookup(result):
+        INFERENCE_CACHE_LOOKUP_COUNTER.labels(result=result).inc()
+
+def register_cvat_task_upload(bytes_sent, execution_time):
+        CVAT_UPLOAD_BYTES_COUNTER.inc(bytes_sent)
+        CVAT_TASK_CREATE_TIME_SUMMARY.observe(execution_time)
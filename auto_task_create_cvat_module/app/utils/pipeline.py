@@ -0,0 +1,205 @@
+import queue
+import logging
+import threading
+import time
+from typing import Callable, Iterable, List
+
+from utils.metrics_prometheus import register_pipeline_stage_time, register_pipeline_queue_size
+
+# Marks the end of the stream inside the stage queues
+_END = object()
+
+
+class Stage:
+    """
+    A step of the pipeline, run by its own pool of worker threads.
+
+    Attributes:
+        name (str): Name of the stage, used for thread names, logs and metrics.
+        func (Callable): Function applied to each item. Returning None drops the item.
+        workers (int): Number of worker threads of the stage.
+        queue_size (int): Capacity of the bounded input queue of the stage.
+        batch_size (int): Maximum number of queued items handed to func at once.
+    """
+
+    def __init__(self, name: str, func: Callable, workers: int = 1, queue_size: int = 8, batch_size: int = 1) -> None:
+        """
+        Initializes a new Stage.
+
+        Args:
+            name (str): Name of the stage.
+            func (Callable): Function applied to each item. When batch_size is greater
+                than 1 it receives a list of items and must return a list of results.
+            workers (int): Number of worker threads.
+            queue_size (int): Capacity of the input queue. A full queue blocks the previous stage.
+            batch_size (int): Maximum number of items handed to func at once. Only items
+                already waiting in the queue are batched, a worker never waits to fill a batch.
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.batch_size = batch_size
+        self.input = queue.Queue(maxsize=queue_size)
+
+
+class Pipeline:
+    """
+    Runs a source and a chain of stages connected by bounded queues.
+
+    Each stage runs on its own threads, so stages that release the GIL (I/O, OpenCV,
+    torch) overlap instead of adding up. When a queue is full the stage feeding it
+    blocks, which propagates backpressure up to the source.
+    """
+
+    def __init__(self, source: Iterable, stages: List[Stage], poll_interval: float = 0.5) -> None:
+        """
+        Initializes the pipeline.
+
+        Args:
+            source (Iterable): Iterable producing the items fed into the first stage.
+            stages (List[Stage]): Stages in processing order.
+            poll_interval (float): Seconds between checks of the stop flag while blocked on a queue.
+        """
+        self._source = source
+        self._stages = stages
+        self._poll_interval = poll_interval
+        self._stop_event = threading.Event()
+        self._error = None
+        self._threads = []
+        self._lock = threading.Lock()
+        self._alive_workers = {stage.name: stage.workers for stage in stages}
+
+    def run(self) -> None:
+        """
+        Starts every stage and blocks until the source is exhausted and all items were processed.
+
+        Raises:
+            Exception: The first error raised by the source or by any stage.
+        """
+        source_thread = threading.Thread(target=self._feed, name="pipeline-source", daemon=True)
+        self._threads = [source_thread]
+        for index, stage in enumerate(self._stages):
+            for worker in range(stage.workers):
+                self._threads.append(threading.Thread(
+                    target=self._work, args=(index,), name=f"pipeline-{stage.name}-{worker}", daemon=True))
+
+        for thread in self._threads:
+            thread.start()
+
+        try:
+            for thread in self._threads:
+                while thread.is_alive():
+                    # The source may be blocked inside its iterator (e.g. waiting for a stream
+                    # entry) and never see the stop flag. It is a daemon thread, so once the
+                    # pipeline stopped it is abandoned instead of joined.
+                    if thread is source_thread and self._stop_event.is_set():
+                        break
+                    thread.join(self._poll_interval)
+        finally:
+            self._stop_event.set()
+
+        if self._error is not None:
+            raise self._error
+
+    def stop(self) -> None:
+        """
+        Asks every thread to stop. Items still queued are discarded.
+        """
+        self._stop_event.set()
+
+    def _fail(self, error: Exception) -> None:
+        with self._lock:
+            if self._error is None:
+                self._error = error
+        self._stop_event.set()
+
+    def _put(self, stage: Stage, item) -> bool:
+        """
+        Puts an item in the queue of a stage, blocking while it is full. Returns False if the pipeline stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                stage.input.put(item, timeout=self._poll_interval)
+                register_pipeline_queue_size(stage.name, stage.input.qsize())
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, stage: Stage):
+        """
+        Takes an item from the queue of a stage, blocking while it is empty. Returns _END if the pipeline stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                return stage.input.get(timeout=self._poll_interval)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _feed(self) -> None:
+        first_stage = self._stages[0]
+        try:
+            for item in self._source:
+                if not self._put(first_stage, item):
+                    return
+        except Exception as e:
+            logging.exception(f"Pipeline source failed: {e}")
+            self._fail(e)
+            return
+        finally:
+            # Releases generator sources (e.g. stops the Redis prefetch thread)
+            if hasattr(self._source, "close"):
+                self._source.close()
+
+        for _ in range(first_stage.workers):
+            self._put(first_stage, _END)
+
+    def _work(self, index: int) -> None:
+        stage = self._stages[index]
+        next_stage = self._stages[index + 1] if index + 1 < len(self._stages) else None
+
+        while True:
+            item = self._get(stage)
+            if item is _END:
+                break
+
+            batch = [item]
+            end_reached = False
+            while len(batch) < stage.batch_size:
+                try:
+                    extra = stage.input.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is _END:
+                    end_reached = True
+                    break
+                batch.append(extra)
+
+            start_time = time.perf_counter()
+            try:
+                if stage.batch_size > 1:
+                    results = stage.func(batch)
+                else:
+                    results = [stage.func(item)]
+            except Exception as e:
+                logging.exception(f"Pipeline stage '{stage.name}' failed: {e}")
+                self._fail(e)
+                return
+            register_pipeline_stage_time(stage.name, time.perf_counter() - start_time)
+
+            if next_stage is not None:
+                for result in results:
+                    if result is not None and not self._put(next_stage, result):
+                        return
+
+            if end_reached:
+                break
+
+        # The last worker of a stage to finish forwards the end of the stream
+        with self._lock:
+            self._alive_workers[stage.name] -= 1
+            last_worker = self._alive_workers[stage.name] == 0
+        if last_worker and next_stage is not None:
+            for _ in range(next_stage.workers):
+                self._put(next_stage, _END)
@@ -0,0 +1,120 @@
+import os
+import json
+import logging
+import threading
+from typing import Dict, List, Tuple
+
+IMAGE_EXTENSIONS = (".jpg", ".png", ".webp")
+
+
+class SpoolManager:
+    """
+    Keeps an in-memory index of the images saved in the spool directory.
+
+    The index is persisted as an append-only JSON lines manifest next to the images, so
+    the directory is scanned only once, at startup. Count and list queries are answered
+    from memory instead of listing the directory.
+
+    Attributes:
+        directory (str): Directory where the images are saved.
+        manifest_path (str): Path of the JSON lines manifest.
+    """
+
+    MANIFEST_NAME = "manifest.jsonl"
+
+    def __init__(self, directory: str) -> None:
+        """
+        Initializes the spool and rebuilds the index from the manifest and the directory.
+
+        Args:
+            directory (str): Directory where the images are saved. Created if it does not exist.
+        """
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, self.MANIFEST_NAME)
+        self._lock = threading.Lock()
+        # Image name -> extra information saved with it, in insertion order
+        self._entries: Dict[str, dict] = {}
+
+        os.makedirs(directory, exist_ok=True)
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        """
+        Loads the manifest, drops entries whose file is gone, adds images missing from it
+        and rewrites the manifest compacted.
+        """
+        entries = {}
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as manifest:
+                for line in manifest:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line may be truncated if the process died while appending
+                        logging.warning(f"Ignoring invalid spool manifest line: {line!r}")
+                        continue
+                    name = record.pop("name")
+                    entries[name] = record
+
+        on_disk = {
+            name for name in os.listdir(self.directory)
+            if name.endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(self.directory, name))
+        }
+        self._entries = {name: info for name, info in entries.items() if name in on_disk}
+        for name in sorted(on_disk - self._entries.keys()):
+            self._entries[name] = {}
+
+        with open(self.manifest_path, "w", encoding="utf-8") as manifest:
+            for name, info in self._entries.items():
+                manifest.write(json.dumps({"name": name, **info}) + "\n")
+
+    def add(self, image_path: str, **info) -> None:
+        """
+        Registers a saved image in the spool.
+
+        Args:
+            image_path (str): Path of the image, inside the spool directory.
+            **info: Extra JSON serializable information stored with the image.
+        """
+        name = os.path.basename(image_path)
+        with self._lock:
+            with open(self.manifest_path, "a", encoding="utf-8") as manifest:
+                manifest.write(json.dumps({"name": name, **info}) + "\n")
+            self._entries[name] = info
+
+    def count(self) -> int:
+        """
+        Returns the number of images in the spool.
+        """
+        return len(self._entries)
+
+    def paths(self) -> List[str]:
+        """
+        Returns the paths of the images in the spool, in the order they were saved.
+        """
+        with self._lock:
+            return [os.path.join(self.directory, name) for name in self._entries]
+
+    def entries(self) -> List[Tuple[str, dict]]:
+        """
+        Returns (path, info) for each image in the spool, in the order they were saved.
+        """
+        with self._lock:
+            return [(os.path.join(self.directory, name), info) for name, info in self._entries.items()]
+
+    def clear(self) -> None:
+        """
+        Deletes every image of the spool and empties the manifest.
+        """
+        with self._lock:
+            for name in self._entries:
+                file_path = os.path.join(self.directory, name)
+                try:
+                    os.unlink(file_path)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logging.error(f"Failed to delete {file_path}. Reason: {e}")
+
+            self._entries = {}
+            open(self.manifest_path, "w", encoding="utf-8").close()
@@ -4,12 +4,14 @@ from typing import List
 from typing import Dict
 import numpy as np 
 import cv2 
-from scipy import stats
 from multiprocessing import Pool
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
 
 
 def calc_width_coil(
-    binary_img: np.ndarray, sampling_interval: int, meas_distance: int
+    binary_img: np.ndarray, sampling_interval: int, meas_distance: int,
+    pool: "WidthMeasurementPool" = None
 ) -> Tuple[np.ndarray, List[Tuple[int, float]]]:
     """
     Calculate the width of an object in a binary image over a
@@ -24,6 +26,8 @@ def calc_width_coil(
     each measurement.
     draw (bool): Whether to draw the measurements on the BGR
     image.
+    pool (WidthMeasurementPool, optional): Process pool used to measure
+    the intervals in parallel. The results are identical to the serial path.
 
     Returns:
     Tuple[np.ndarray, List[Tuple[int, float]]]: The original BGR image with or
@@ -35,50 +39,152 @@ def calc_width_coil(
     step = sampling_interval + meas_distance
 
     intervals = np.arange(0, height, step)
-    measurements = []
+    intervals = intervals[intervals + sampling_interval < height]
+
+    if pool is not None:
+        return pool.measure(binary_img, intervals, sampling_interval)
+
+    # Scan the edges of every row once, instead of walking pixels per interval
+    edges = _scan_edges(binary_img)
 
-    for _, interval in enumerate(intervals):
-        if interval + sampling_interval < height:
-            # Measure the distance at the given interval
-            info = _measure_distance_at_interval(
-                binary_img, interval, interval + sampling_interval
-            )
-            measurements.append((interval, info))
+    # Measure the distance at every interval with one batched fit
+    measurements = _measure_intervals(edges, intervals, sampling_interval)
 
     measurements = tuple(measurements)
     return measurements
 
 
-def _worker_function(args: Tuple[np.ndarray, int, int]) -> Tuple[int, float]:
+class WidthMeasurementPool:
     """
-    Process a single interval to measure distance.
+    Persistent process pool that measures the intervals of tall images in parallel.
 
-    Args:
-        args (Tuple[np.ndarray, int, int]): A tuple containing the binary image,
-                                            interval start, and sampling interval.
+    The binary image is copied once per call into shared memory. The workers
+    attach to it by name, so only the interval lists and the measurements are
+    pickled, never the image.
+    """
 
-    Returns:
-        Tuple[int, float]: The interval and the measured distance information.
+    def __init__(self, processes: int = None, chunks_per_process: int = 2) -> None:
+        """
+        Start the worker processes.
+
+        Parameters:
+        processes (int, optional): Number of worker processes. Defaults to the CPU count.
+        chunks_per_process (int): Number of interval chunks handed to each process per call.
+        """
+        self._processes = processes or os.cpu_count()
+        self._chunks_per_process = chunks_per_process
+        # Started before the workers, so they share it instead of each starting its own
+        resource_tracker.ensure_running()
+        self._pool = Pool(self._processes)
+        self._shm = None
+
+    def measure(
+        self, binary_img: np.ndarray, intervals: np.ndarray, sampling_interval: int
+    ) -> Tuple[Tuple[int, Dict[str, Tuple[int, int]]], ...]:
+        """
+        Measure the given intervals of a binary image on the pool.
+
+        Parameters:
+        binary_img (np.ndarray): The binary image.
+        intervals (np.ndarray): Start row of each interval.
+        sampling_interval (int): Number of rows of each interval.
+
+        Returns:
+        Tuple: The start row and the measurement dictionary of each interval,
+        in the same order as the serial path.
+        """
+        if len(binary_img.shape) != 2:
+            raise ValueError(f"Image is not grayscale. It has shape: {binary_img.shape}.")
+
+        # The shared block is kept between calls and only grows when an image does not fit
+        if self._shm is None or self._shm.size < binary_img.nbytes:
+            self._release_shared_memory()
+            self._shm = SharedMemory(create=True, size=binary_img.nbytes)
+        shared_img = np.ndarray(binary_img.shape, dtype=binary_img.dtype, buffer=self._shm.buf)
+        shared_img[...] = binary_img
+
+        chunks = [
+            chunk for chunk in np.array_split(intervals, self._processes * self._chunks_per_process)
+            if chunk.size
+        ]
+        tasks = [
+            (self._shm.name, binary_img.shape, binary_img.dtype.str, chunk, sampling_interval)
+            for chunk in chunks
+        ]
+
+        measurements = []
+        for chunk_measurements in self._pool.map(_worker_function, tasks):
+            measurements.extend(chunk_measurements)
+        return tuple(measurements)
+
+    def _release_shared_memory(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def close(self) -> None:
+        """
+        Stop the worker processes and free the shared memory.
+        """
+        self._pool.close()
+        self._pool.join()
+        self._release_shared_memory()
+
+    def __enter__(self) -> "WidthMeasurementPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+# Shared memory block the worker process is attached to
+_worker_shm = None
+
+
+def _attach_shared_memory(name: str) -> SharedMemory:
     """
-    binary_img, interval, sampling_interval = args
-    info = _measure_distance_at_interval(
-        binary_img, interval, interval + sampling_interval
-    )
-    return (interval, info)
+    Attach the worker process to a shared memory block, reusing the last attachment.
+    """
+    global _worker_shm
+    if _worker_shm is None or _worker_shm.name != name:
+        if _worker_shm is not None:
+            _worker_shm.close()
+        # The workers share the parent's resource tracker: attaching registers the block
+        # again (a no-op) and the parent's unlink clears it
+        _worker_shm = SharedMemory(name=name)
+    return _worker_shm
+
+
+def _worker_function(
+    args: Tuple[str, Tuple[int, int], str, np.ndarray, int]
+) -> List[Tuple[int, Dict[str, Tuple[int, int]]]]:
+    """
+    Process a chunk of intervals to measure distance.
 
+    Args:
+        args (Tuple[str, Tuple[int, int], str, np.ndarray, int]): A tuple containing
+            the shared memory name, shape and dtype of the binary image, the
+            interval starts, and the sampling interval.
 
-# Helper functions for checking if the border is straight and calculating simple midpoint
-def _is_straight_border(points):
-    return all(x == points[0][0] for x, _ in points) if points else False
+    Returns:
+        List[Tuple[int, Dict[str, Tuple[int, int]]]]: The interval and the
+        measured distance information of each interval of the chunk.
+    """
+    shm_name, shape, dtype, intervals, sampling_interval = args
+    shm = _attach_shared_memory(shm_name)
+    binary_img = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
 
+    # Only the rows covered by the chunk are scanned
+    first_row = int(intervals[0])
+    last_row = int(intervals[-1]) + sampling_interval
+    edges = _scan_edges(binary_img[first_row:last_row])
 
-def _calculate_simple_midpoint(points):
-    avg_y = int(sum(y for _, y in points) / len(points))
-    return (points[0][0], avg_y)
+    return _measure_intervals(edges, intervals, sampling_interval, offset=first_row)
 
 
 def _measure_distance_at_interval(
-    img: np.ndarray, start: int, end: int
+    img: np.ndarray, start: int, end: int, edges: Tuple[np.ndarray, np.ndarray] = None
 ) -> Dict[str, Tuple[int, int]]:
     """
     Measure the distance at a given interval in a binary image.
@@ -87,115 +193,174 @@ def _measure_distance_at_interval(
     - img (np.ndarray): The binary image.
     - start (int): The start of the interval.
     - end (int): The end of the interval.
+    - edges (Tuple[np.ndarray, np.ndarray], optional): Left and right edge
+      columns of every row of the image, as returned by _scan_edges. Scanned
+      from the whole image when omitted.
 
     Returns:
     - Dict[str, Tuple[int, int]]: A dictionary containing the coordinates of
       right and left edges, their midpoints, and the calculated distance.
     """
+    if edges is None:
+        edges = _scan_edges(img)
 
-    right_edge_points = _collect_edge_points(img, start, end, direction="right")
-    left_edge_points = _collect_edge_points(img, start, end, direction="left")
+    [(_, info)] = _measure_intervals(edges, np.array([start]), end - start)
+    return info
 
-    mid_point_right = _select_midpoint(right_edge_points)
-    mid_point_left = _select_midpoint(left_edge_points)
 
-    distance = mid_point_right[0] - mid_point_left[0]
+def _measure_intervals(
+    edges: Tuple[np.ndarray, np.ndarray], intervals: np.ndarray, sampling_interval: int,
+    offset: int = 0
+) -> List[Tuple[int, Dict[str, Tuple[int, int]]]]:
+    """
+    Measure the distance at several intervals of a binary image at once.
 
-    right_edge_start = right_edge_points[0] if right_edge_points else (0, 0)
-    right_edge_end = right_edge_points[-1] if right_edge_points else (0, 0)
-    left_edge_start = left_edge_points[0] if left_edge_points else (0, 0)
-    left_edge_end = left_edge_points[-1] if left_edge_points else (0, 0)
+    Parameters:
+    - edges (Tuple[np.ndarray, np.ndarray]): Left and right edge columns of
+      every row of the image, as returned by _scan_edges.
+    - intervals (np.ndarray): Start row of each interval.
+    - sampling_interval (int): Number of rows of each interval.
+    - offset (int): Image row matching the first element of the edge arrays.
 
+    Returns:
+    - List[Tuple[int, Dict[str, Tuple[int, int]]]]: The start row and the
+      measurement dictionary of each interval, see _measure_distance_at_interval.
+    """
+    left_edges, right_edges = edges
 
-    # Calculate the center point
-    center_point_x = (mid_point_right[0] + mid_point_left[0]) // 2
-    center_point_y = (mid_point_right[1] + mid_point_left[1]) // 2
-    center_point = (center_point_x, center_point_y)
+    # (interval, row) grid of the rows covered by each interval
+    rows = intervals[:, None] + np.arange(sampling_interval)
+    right_columns = right_edges[rows - offset]
+    left_columns = left_edges[rows - offset]
 
-    # Return statement including the new center point
-    return {
-        "right_edge_start": right_edge_start,
-        "right_edge_end": right_edge_end,
-        "left_edge_start": left_edge_start,
-        "left_edge_end": left_edge_end,
-        "mid_point_right": mid_point_right,
-        "mid_point_left": mid_point_left,
-        "distance": distance,
-        "center_point": center_point
-    }
+    right_midpoints = _fit_edge_midpoints(right_columns, rows)
+    left_midpoints = _fit_edge_midpoints(left_columns, rows)
 
+    measurements = []
+    for i, interval in enumerate(intervals):
+        mid_point_right = right_midpoints[i]
+        mid_point_left = left_midpoints[i]
+
+        distance = mid_point_right[0] - mid_point_left[0]
+
+        right_edge_start, right_edge_end = _edge_end_points(right_columns[i], rows[i])
+        left_edge_start, left_edge_end = _edge_end_points(left_columns[i], rows[i])
+
+        # Calculate the center point
+        center_point_x = (mid_point_right[0] + mid_point_left[0]) // 2
+        center_point_y = (mid_point_right[1] + mid_point_left[1]) // 2
+        center_point = (center_point_x, center_point_y)
+
+        # Return statement including the new center point
+        measurements.append((interval, {
+            "right_edge_start": right_edge_start,
+            "right_edge_end": right_edge_end,
+            "left_edge_start": left_edge_start,
+            "left_edge_end": left_edge_end,
+            "mid_point_right": mid_point_right,
+            "mid_point_left": mid_point_left,
+            "distance": distance,
+            "center_point": center_point
+        }))
 
-def _select_midpoint(edge_points: list) -> Tuple[int, int]:
-    """
-    Select the appropriate midpoint calculation method.
+    return measurements
 
-    Parameters:
-    - edge_points (list): List of edge points.
 
-    Returns:
-    - Tuple[int, int]: The calculated midpoint.
+def _edge_end_points(
+    columns: np.ndarray, rows: np.ndarray
+) -> Tuple[Tuple[int, int], Tuple[int, int]]:
     """
-    if _is_straight_border(edge_points):
-        return _calculate_simple_midpoint(edge_points)
-    else:
-        return _calculate_regression_midpoint(edge_points)
+    Return the first and last (x, y) edge points of an interval, (0, 0) if it has none.
+    """
+    found = np.flatnonzero(columns != -1)
+    if found.size == 0:
+        return (0, 0), (0, 0)
+    first, last = found[0], found[-1]
+    return (int(columns[first]), int(rows[first])), (int(columns[last]), int(rows[last]))
 
 
-def _collect_edge_points(
-    img: np.ndarray, start: int, end: int, direction: str
-) -> List[Tuple[int, int]]:
+def _fit_edge_midpoints(
+    columns: np.ndarray, rows: np.ndarray
+) -> List[Tuple[float, float]]:
     """
-    Collect points along an edge within a specified interval.
+    Calculate the midpoint of the edge of several intervals with one batched
+    least-squares fit.
+
+    A straight (vertical) edge has no regression line, so its midpoint is the
+    edge column and the average row. Any other edge is fitted with the
+    closed-form least-squares line and its midpoint is the line evaluated at
+    the mean column.
 
     Parameters:
-    img (np.ndarray): The binary image.
-    start (int): The start of the interval.
-    end (int): The end of the interval.
-    direction (str): The direction to search ('left' or 'right').
+    columns (np.ndarray): (interval, row) edge columns, -1 where there is no edge.
+    rows (np.ndarray): (interval, row) row of each column.
 
     Returns:
-    List[Tuple[int, int]]: A list of points along the edge.
+    List[Tuple[float, float]]: The midpoint of each interval.
     """
-    points = []
-    for y in range(start, end):
-        x = _find_horizontal_distance(img, y, direction)
-        if x != -1:
-            points.append((x, y))
-    return points
+    found = columns != -1
+    count = found.sum(axis=1)
+
+    empty = np.flatnonzero(count == 0)
+    if empty.size:
+        raise ValueError(f"Need at least two points for regression, points: [] (interval starting at row {rows[empty[0], 0]})")
+
+    x = np.where(found, columns, 0).astype(np.float64)
+    y = np.where(found, rows, 0).astype(np.float64)
+
+    mean_x = x.sum(axis=1) / count
+    mean_y = y.sum(axis=1) / count
+
+    # Centered sums, so large row numbers do not cost precision
+    dx = np.where(found, x - mean_x[:, None], 0)
+    dy = np.where(found, y - mean_y[:, None], 0)
+    sxx = (dx * dx).sum(axis=1)
+    sxy = (dx * dy).sum(axis=1)
+
+    # Every found column equal: the border is straight
+    straight = np.where(found, columns, columns.max(axis=1)[:, None]).min(axis=1) == columns.max(axis=1)
 
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = sxy / sxx
+    intercept = mean_y - slope * mean_x
+    fitted_y = slope * mean_x + intercept
 
-def _find_horizontal_distance(img: np.ndarray, y: int, direction: str) -> int:
+    midpoints = []
+    for i in range(columns.shape[0]):
+        if straight[i]:
+            first = np.argmax(found[i])
+            avg_y = int(y[i].sum() / count[i])
+            midpoints.append((int(columns[i, first]), avg_y))
+        else:
+            midpoints.append((mean_x[i], fitted_y[i]))
+
+    return midpoints
+
+
+def _scan_edges(img: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Find the horizontal distance of a point in the image.
+    Find the first and last white (255) column of every row of the image.
 
     Parameters:
     img (np.ndarray): The binary image.
-    y (int): The y-coordinate of the point.
-    direction (str): The direction to search ('left' or 'right').
 
     Returns:
-    int: The x-coordinate of the point.
+    Tuple[np.ndarray, np.ndarray]: The left and right edge columns of each
+    row, -1 for rows without white pixels.
     """
-    y = int(y)
-
     # Check if the image is actually grayscale
     if len(img.shape) != 2:
         raise ValueError(f"Image is not grayscale. It has shape: {img.shape}.")
 
     width = img.shape[1]
+    mask = img == 255
+    has_edge = mask.any(axis=1)
 
-    if direction == "right":
-        for i in reversed(range(width)):
-            if img[y, i] == 255:
-                return i
-    elif direction == "left":
-        for i in range(width):
-            if img[y, i] == 255:
-                return i
-
-    return -1
-
+    # argmax returns the first True of each row; on the reversed rows, the last one
+    left_edges = np.where(has_edge, mask.argmax(axis=1), -1)
+    right_edges = np.where(has_edge, width - 1 - mask[:, ::-1].argmax(axis=1), -1)
 
+    return left_edges, right_edges
 
 
 def calculate_simple_midpoint(points: List[Tuple[int, int]]) -> Tuple[int, int]:
@@ -225,29 +390,3 @@ def _calculate_middle_point(
     Tuple[int, int]: The middle point.
     """
     return (int((p1[0] + p2[0]) / 2), int((p1[1] + p2[1]) / 2))
-
-
-def _calculate_regression_midpoint(
-    points: List[Tuple[int, int]]
-) -> Tuple[float, float]:
-    """
-    Calculate the midpoint using linear regression on a set of points.
-
-    Parameters:
-    points (List[Tuple[int, int]]): The list of points to fit the line.
-
-    Returns:
-    Tuple[float, float]: The midpoint calculated from the regression line.
-    """
-    if len(points) < 2:
-        raise ValueError(f"Need at least two points for regression, points: {points}")
-    
-    x = [p[0] for p in points]
-    y = [p[1] for p in points]
-
-    slope, intercept, _, _, _ = stats.linregress(x, y)
-
-    mean_x = np.mean(x)
-    mean_y = slope * mean_x + intercept
-
-    return (mean_x, mean_y)
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The application modules import each other from app/ (e.g. "from utils.x import y")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
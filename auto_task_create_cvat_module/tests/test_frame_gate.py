@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from utils.frame_gate import FrameGate
+
+
+def _coil(height, width, slant=0, seed=0):
+    """Bright coil over a dark background, with sensor noise."""
+    rng = np.random.default_rng(seed)
+    rows = np.arange(height, dtype=np.float32)
+    center = width / 2 + slant * (rows / height - 0.5)
+    distance = np.abs(np.arange(width, dtype=np.float32) - center[:, None])
+    image = np.where(distance < width * 0.3, np.float32(120), np.float32(6))
+    image += rng.normal(0, 4, size=(height, width)).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def _with_blob(image, value):
+    image = image.copy()
+    image[400:460, 900:960] = value
+    return image
+
+
+def _with_small_defect(image):
+    image = image.copy()
+    image[300:315, 700:715] = 255
+    return image
+
+
+def _with_scratch(image):
+    image = image.copy()
+    image[1000:3000, 3000:3030] += 80
+    return image
+
+
+@pytest.fixture
+def gate():
+    return FrameGate(mode="on")
+
+
+@pytest.mark.parametrize("image", [
+    pytest.param(_with_blob(_coil(1000, 2000), 255), id="saturated-blob"),
+    pytest.param(_with_blob(_coil(1000, 2000, slant=200), 20), id="dark-blob-slanted"),
+    pytest.param(_with_small_defect(_coil(1000, 2000)), id="small-defect"),
+    pytest.param(_with_scratch(_coil(4096, 8000)), id="thin-scratch"),
+])
+def test_defect_frames_pass(gate, image):
+    has_candidates, stats = gate.evaluate(image)
+
+    assert has_candidates, stats
+
+
+@pytest.mark.parametrize("image", [
+    pytest.param(np.full((1000, 2000), 6, dtype=np.uint8), id="dark"),
+    pytest.param(_coil(1000, 2000), id="clean-coil"),
+    pytest.param(_coil(1000, 2000, slant=400, seed=1), id="clean-slanted-coil"),
+    pytest.param(_coil(4096, 8000, seed=2), id="clean-large-coil"),
+])
+def test_flat_frames_are_skipped(gate, image):
+    has_candidates, stats = gate.evaluate(image)
+
+    assert not has_candidates, stats
+
+
+def test_mono12_frames_are_scaled_before_the_statistics(gate):
+    image = _with_blob(_coil(1000, 2000), 255).astype(np.uint16) * 16
+
+    assert gate.evaluate(image)[0]
+    assert not gate.evaluate(_coil(1000, 2000).astype(np.uint16) * 16)[0]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        FrameGate(mode="always")
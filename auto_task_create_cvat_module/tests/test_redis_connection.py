@@ -0,0 +1,84 @@
+import pickle
+
+import numpy as np
+
+from dao.redis_connection import RedisConnection
+from utils.frame_codec import encode_frame
+
+
+class FakeRedis:
+    """Answers XREAD with the queued replies, then with nothing."""
+
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.requested_ids = []
+
+    def xread(self, streams, count=None, block=None):
+        self.requested_ids.append(dict(streams))
+        return self.replies.pop(0) if self.replies else []
+
+
+def _binary_entry(value):
+    return encode_frame({"camera": {"image": np.full((2, 2), value, dtype=np.uint8), "pixelformat": "Mono8"}})
+
+
+def _pickle_entry(value):
+    return {b"data_serialized": pickle.dumps({"camera": {"image": np.full((2, 2), value, dtype=np.uint8)}})}
+
+
+def _connection(replies, allow_pickle):
+    connection = RedisConnection("localhost", 6379, 0, allow_pickle=allow_pickle)
+    connection.redis_client = FakeRedis(replies)
+    return connection
+
+
+MIXED_BATCH = [[
+    (b"cam1", [
+        (b"1-0", _binary_entry(1)),
+        (b"2-0", _pickle_entry(2)),
+        (b"3-0", {b"header": b"garbage", b"pixels": b""}),
+        (b"4-0", _binary_entry(4)),
+    ]),
+    (b"cam2", [
+        (b"1-0", _pickle_entry(5)),
+    ]),
+]]
+
+
+def _first_pixels(entries):
+    return [(stream_key, int(data["camera"]["image"].ravel()[0])) for stream_key, data, _ in entries]
+
+
+def test_rejected_entries_are_skipped_without_losing_the_batch():
+    connection = _connection(MIXED_BATCH, allow_pickle=False)
+    last_ids = {"cam1": "0", "cam2": "0"}
+
+    entries = connection.get_from_streams(last_ids, count=8)
+
+    assert _first_pixels(entries) == [("cam1", 1), ("cam1", 4)]
+    # The last IDs move past the skipped entries, so they are not read again
+    assert last_ids == {"cam1": b"4-0", "cam2": b"1-0"}
+    assert connection.REJECTED_COUNTER._value.get() == 3
+
+
+def test_pickle_entries_are_read_when_allowed():
+    connection = _connection(MIXED_BATCH, allow_pickle=True)
+
+    entries = connection.get_from_streams({"cam1": "0", "cam2": "0"}, count=8)
+
+    assert _first_pixels(entries) == [("cam1", 1), ("cam1", 2), ("cam1", 4), ("cam2", 5)]
+    assert connection.REJECTED_COUNTER._value.get() == 1
+
+
+def test_iter_stream_keeps_reading_after_a_rejected_entry():
+    only_rejected = [[(b"cam1", [(b"1-0", _pickle_entry(1))])]]
+    connection = _connection(only_rejected + [[(b"cam1", [(b"2-0", _binary_entry(2))])]], allow_pickle=False)
+
+    stream = connection.iter_stream({"cam1": "0"}, count=8, block=10)
+    try:
+        stream_key, data, last_id = next(stream)
+    finally:
+        stream.close()
+
+    assert (stream_key, int(data["camera"]["image"].ravel()[0]), last_id) == ("cam1", 2, b"2-0")
+    assert connection.redis_client.requested_ids[1] == {"cam1": b"1-0"}
@@ -0,0 +1,144 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_binary_coil_image
+from utils.width_measurement import WidthMeasurementPool, calc_width_coil
+
+stats = pytest.importorskip("scipy.stats")
+
+
+# Reference: the per-pixel scan and scipy fit calc_width_coil used before it was vectorized
+
+def _reference_calc_width_coil(binary_img: np.ndarray, sampling_interval: int, meas_distance: int):
+    height, _ = binary_img.shape
+    step = sampling_interval + meas_distance
+
+    measurements = []
+    for interval in np.arange(0, height, step):
+        if interval + sampling_interval < height:
+            info = _reference_measure(binary_img, interval, interval + sampling_interval)
+            measurements.append((interval, info))
+    return tuple(measurements)
+
+
+def _reference_measure(img: np.ndarray, start: int, end: int) -> Dict[str, Tuple[int, int]]:
+    right_edge_points = _reference_edge_points(img, start, end, "right")
+    left_edge_points = _reference_edge_points(img, start, end, "left")
+
+    mid_point_right = _reference_midpoint(right_edge_points)
+    mid_point_left = _reference_midpoint(left_edge_points)
+
+    return {
+        "right_edge_start": right_edge_points[0] if right_edge_points else (0, 0),
+        "right_edge_end": right_edge_points[-1] if right_edge_points else (0, 0),
+        "left_edge_start": left_edge_points[0] if left_edge_points else (0, 0),
+        "left_edge_end": left_edge_points[-1] if left_edge_points else (0, 0),
+        "mid_point_right": mid_point_right,
+        "mid_point_left": mid_point_left,
+        "distance": mid_point_right[0] - mid_point_left[0],
+        "center_point": (
+            (mid_point_right[0] + mid_point_left[0]) // 2,
+            (mid_point_right[1] + mid_point_left[1]) // 2,
+        ),
+    }
+
+
+def _reference_edge_points(img: np.ndarray, start: int, end: int, direction: str) -> List[Tuple[int, int]]:
+    width = img.shape[1]
+    columns = range(width - 1, -1, -1) if direction == "right" else range(width)
+
+    points = []
+    for y in range(start, end):
+        for x in columns:
+            if img[y, x] == 255:
+                points.append((x, y))
+                break
+    return points
+
+
+def _reference_midpoint(points: List[Tuple[int, int]]) -> Tuple[float, float]:
+    if points and all(x == points[0][0] for x, _ in points):
+        return (points[0][0], int(sum(y for _, y in points) / len(points)))
+    if len(points) < 2:
+        raise ValueError(f"Need at least two points for regression, points: {points}")
+
+    x = [p[0] for p in points]
+    y = [p[1] for p in points]
+    slope, intercept, _, _, _ = stats.linregress(x, y)
+    mean_x = np.mean(x)
+    return (mean_x, slope * mean_x + intercept)
+
+
+def _assert_same_measurements(actual, expected, tolerance=1e-9):
+    assert len(actual) == len(expected)
+    for (interval, info), (expected_interval, expected_info) in zip(actual, expected):
+        assert interval == expected_interval
+        assert info.keys() == expected_info.keys()
+        for key, value in expected_info.items():
+            assert info[key] == pytest.approx(value, rel=tolerance, abs=tolerance), (interval, key)
+
+
+def _coil(**kwargs) -> np.ndarray:
+    return generate_binary_coil_image(400, 300, **kwargs)
+
+
+def _straight_coil() -> np.ndarray:
+    image = np.zeros((400, 300), dtype=np.uint8)
+    image[:, 60:241] = 255
+    return image
+
+
+def _coil_with_gap() -> np.ndarray:
+    # Rows without any coil pixel, shorter than any interval
+    image = _coil(seed=3)
+    image[131:136] = 0
+    return image
+
+
+@pytest.mark.parametrize("image", [
+    pytest.param(_straight_coil(), id="straight"),
+    pytest.param(_coil(slant_px=80, noise_sigma=0, missing_edge_fraction=0), id="slanted"),
+    pytest.param(_coil(noise_sigma=25, missing_edge_fraction=0, seed=1), id="noisy"),
+    pytest.param(_coil(missing_edge_fraction=0.3, seed=2), id="missing-edge"),
+    pytest.param(_coil_with_gap(), id="empty-rows"),
+])
+@pytest.mark.parametrize("sampling_interval, meas_distance", [(20, 30), (7, 0)])
+def test_matches_per_pixel_scan(image, sampling_interval, meas_distance):
+    expected = _reference_calc_width_coil(image, sampling_interval, meas_distance)
+    actual = calc_width_coil(image, sampling_interval, meas_distance)
+
+    _assert_same_measurements(actual, expected)
+
+
+def test_interval_without_edges_raises_like_per_pixel_scan():
+    image = _coil(seed=4)
+    image[100:140] = 0
+
+    with pytest.raises(ValueError):
+        _reference_calc_width_coil(image, 20, 30)
+    with pytest.raises(ValueError):
+        calc_width_coil(image, 20, 30)
+
+
+def test_precision_on_tall_images():
+    # Far from the first row the centered least-squares sums must not lose precision
+    image = generate_binary_coil_image(20000, 300, slant_px=120, seed=5)
+
+    expected = _reference_calc_width_coil(image, 20, 480)
+    actual = calc_width_coil(image, 20, 480)
+
+    _assert_same_measurements(actual, expected, tolerance=1e-12)
+
+
+def test_pool_matches_serial_path():
+    image = generate_binary_coil_image(3000, 300, seed=6)
+
+    with WidthMeasurementPool(processes=2) as pool:
+        pooled = calc_width_coil(image, 20, 30, pool=pool)
+        # The shared block is reused and grown between calls
+        pooled_taller = calc_width_coil(np.vstack([image, image]), 20, 30, pool=pool)
+
+    assert pooled == calc_width_coil(image, 20, 30)
+    assert pooled_taller == calc_width_coil(np.vstack([image, image]), 20, 30)